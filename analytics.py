@@ -7,82 +7,133 @@ from kivy.uix.togglebutton import ToggleButton
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.widget import Widget
+from kivy.uix.textinput import TextInput
+from kivy.uix.popup import Popup
 from kivy.metrics import dp
 from kivy.app import App
 from kivy.graphics import Color, Ellipse, Line, Rectangle
 from kivy.clock import Clock
-from collections import defaultdict, OrderedDict
+from kivy.logger import Logger
+import os
 from datetime import datetime
+from profiling import timed
+from db_events import HISTORY_ADDED, MEMBER_EVENTS, DirtyFlag
+from reports import ALL_MEMBERS, AnalyticsReport, top_n
+from timeseries import bucket_points, choose_bucket, day_bounds, minmax_downsample, normalize, period_bounds
+
+# FU_ANALYTICS_ENGINE=numpy — считать по колоночному снимку истории, иначе SQL;
+# NumPy импортирует AnalyticsReport и только в этом режиме (без NumPy — тоже SQL)
+USE_COLUMNAR = os.environ.get("FU_ANALYTICS_ENGINE") == "numpy"
+
+# пресеты периода (ключи timeseries.period_bounds) и пункт произвольного диапазона
+PERIOD_LABELS = {"all": "Всё время", "month": "Этот месяц", "quarter": "Этот квартал", "year": "Этот год"}
+CUSTOM_PERIOD_LABEL = "Свой период..."
+
 
 class PieWidget(Widget):
+    """Кольцевая диаграмма: инструкции canvas создаются при смене данных, при resize меняется только геометрия."""
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.data = {}
         self.colors = [(0.9,0.4,0.4,1),(0.4,0.9,0.6,1),(0.4,0.6,0.9,1),(0.9,0.8,0.4,1),(0.7,0.4,0.9,1),(0.4,0.9,0.8,1)]
+        self._slices = []
+        self._hole = None
         self.bind(pos=self.draw, size=self.draw)
 
     def set_data(self, data: dict):
-        self.data = data or {}
+        self.data = top_n(data)
+        self._build()
         self.draw()
 
-    def draw(self, *a):
+    def _build(self):
         self.canvas.clear()
+        self._slices = []
+        self._hole = None
         total = sum(self.data.values())
         if total <= 0:
             return
-        cx, cy = self.center
-        radius = min(self.size) * 0.4
         start = 0
-        i = 0
         with self.canvas:
-            for k, v in self.data.items():
+            for i, v in enumerate(self.data.values()):
                 angle = 360 * v / total
                 Color(*self.colors[i % len(self.colors)])
-                Ellipse(pos=(cx-radius, cy-radius), size=(radius*2, radius*2), angle_start=start, angle_end=start+angle)
+                self._slices.append(Ellipse(angle_start=start, angle_end=start+angle))
                 start += angle
-                i += 1
             # inner circle to make donut
             Color(0.08,0.08,0.10,1)
-            Ellipse(pos=(cx-radius*0.5, cy-radius*0.5), size=(radius, radius))
+            self._hole = Ellipse()
+
+    def draw(self, *a):
+        if self._hole is None:
+            return
+        cx, cy = self.center
+        radius = min(self.size) * 0.4
+        for e in self._slices:
+            e.pos = (cx-radius, cy-radius)
+            e.size = (radius*2, radius*2)
+        self._hole.pos = (cx-radius*0.5, cy-radius*0.5)
+        self._hole.size = (radius, radius)
 
 class LineWidget(Widget):
+    """График тренда: одна инструкция Line, при resize и смене данных меняются только её точки."""
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.points = []
+        # bucket: "auto" — интервал подбирается по ширине; либо "day" / "week" / "month"
+        self.bucket = "auto"
+        # {ширина в пикселях: нормированные точки после группировки и прореживания} —
+        # только для текущей ширины, иначе при resize копились бы ряды всех промежуточных ширин
+        self._series = {}
+        with self.canvas:
+            Color(0.1,0.6,1,1)
+            self._line = Line(points=[], width=2)
         self.bind(pos=self.draw, size=self.draw)
 
     def set_points(self, points):
-        # points: list of (date_obj, value)
+        # points: list of (date_obj, value), sorted by date
         self.points = points or []
+        self._series.clear()
         self.draw()
 
+    def _prepared(self, columns):
+        """Точки для ширины columns: не больше двух на колонку пикселей; пересчитываются при смене ширины."""
+        series = self._series.get(columns)
+        if series is None:
+            bucket = self.bucket if self.bucket != "auto" else choose_bucket(self.points, columns)
+            xs, ys = normalize(bucket_points(self.points, bucket))
+            series = minmax_downsample(xs, ys, columns)
+            self._series = {columns: series}
+        return series
+
     def draw(self, *a):
-        self.canvas.clear()
         if not self.points:
+            self._line.points = []
             return
-        xs = [p[0].timestamp() for p in self.points]
-        ys = [p[1] for p in self.points]
-        minx, maxx = min(xs), max(xs)
-        miny, maxy = min(ys), max(ys)
-        if miny == maxy:
-            miny = 0
         w, h = self.size
         px, py = self.pos
-        with self.canvas:
-            Color(0.1,0.6,1,1)
-            pts = []
-            for x_val, y_val in zip(xs, ys):
-                nx = px + ((x_val - minx) / (maxx - minx if maxx!=minx else 1)) * w
-                ny = py + ((y_val - miny) / (maxy - miny if maxy!=miny else 1)) * h
-                pts.extend([nx, ny])
-            if pts:
-                Line(points=pts, width=2)
+        xs, ys = self._prepared(max(1, int(w)))
+        pts = []
+        for nx, ny in zip(xs, ys):
+            pts.extend([px + nx * w, py + ny * h])
+        self._line.points = pts
 
 class AnalyticsScreen(Screen):
     def __init__(self, db=None, **kwargs):
         super().__init__(**kwargs)
         self.db = db
+        self._changes = None
         self.mode = "expense"
+        # период: ключ пресета или "custom" с границами в self.custom_range
+        self.period = "all"
+        self.custom_range = (None, None)
+        self._custom_text = ""
+        self._refresh_seq = 0
+        self._loaded = False
+        # суммы по (пользователь, режим, участник); при повторном показе досчитываются только новые записи
+        # расчёты (кэш агрегатов или колоночный снимок) — в reports.py, без Kivy
+        self._report = AnalyticsReport(columnar=USE_COLUMNAR)
         with self.canvas.before:
             Color(0.08,0.08,0.10,1)
             self.bg = Rectangle(size=self.size, pos=self.pos)
@@ -91,7 +142,7 @@ class AnalyticsScreen(Screen):
         root = BoxLayout(orientation="vertical", padding=dp(12), spacing=dp(8))
 
         header = BoxLayout(size_hint_y=None, height=dp(44), spacing=dp(8))
-        self.member_spinner = Spinner(text="Все участники", values=["Все участники"], size_hint_x=0.5)
+        self.member_spinner = Spinner(text=ALL_MEMBERS, values=[ALL_MEMBERS], size_hint_x=0.5)
         header.add_widget(self.member_spinner)
         self.btn_exp = ToggleButton(text="Расходы", group="mode", state="down")
         self.btn_inc = ToggleButton(text="Доходы", group="mode")
@@ -104,6 +155,13 @@ class AnalyticsScreen(Screen):
         header.add_widget(btn_refresh)
         root.add_widget(header)
 
+        period_row = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(8))
+        self.period_spinner = Spinner(text=PERIOD_LABELS["all"],
+                                      values=list(PERIOD_LABELS.values()) + [CUSTOM_PERIOD_LABEL])
+        self.period_spinner.bind(text=self.on_period_select)
+        period_row.add_widget(self.period_spinner)
+        root.add_widget(period_row)
+
         main = BoxLayout(spacing=dp(8))
         left = BoxLayout(orientation="vertical", size_hint_x=0.6)
         self.pie = PieWidget(size_hint_y=0.6)
@@ -130,7 +188,7 @@ class AnalyticsScreen(Screen):
         root.add_widget(bottom)
 
         self.add_widget(root)
-        Clock.schedule_once(lambda dt: self.refresh(), 0.1)
+        # данные загружаются в on_pre_enter, при первом показе экрана
 
     def _upd(self, *a):
         self.bg.size = self.size
@@ -140,53 +198,104 @@ class AnalyticsScreen(Screen):
         self.mode = mode
         self.refresh()
 
-    def _load_history(self):
-        db_loc = self.db or App.get_running_app().db
-        return db_loc.get_history()
+    # ---------- период ----------
+    def on_period_select(self, spinner, text):
+        for key, label in PERIOD_LABELS.items():
+            if text == label:
+                self.period = key
+                self.refresh()
+                return
+        if text == CUSTOM_PERIOD_LABEL:
+            self.open_custom_period()
+        # иначе это подпись уже выбранного произвольного периода
 
-    def refresh(self):
-        db_loc = self.db or App.get_running_app().db
-        members = ["Все участники"] + [m["name"] for m in db_loc.get_family_members()]
-        self.member_spinner.values = members
-        if self.member_spinner.text not in members:
-            self.member_spinner.text = "Все участники"
-
-        raw = self._load_history()
-        # filter by mode and member
-        selected_member = self.member_spinner.text
-        data_by_cat = defaultdict(float)
-        daily = defaultdict(float)
-        for typ, amount, category, desc, date_str, member_id in raw:
-            if self.mode == "income" and typ != "income":
-                continue
-            if self.mode == "expense" and typ != "expense":
-                continue
-            # member filter
-            member_name = db_loc.get_member_name(member_id)
-            if selected_member != "Все участники" and member_name != selected_member:
-                continue
-            data_by_cat[category or "Прочее"] += amount
-            # parse date
-            dt = None
+    def _period_text(self):
+        if self.period == "custom":
+            return self._custom_text
+        return PERIOD_LABELS[self.period]
+
+    def open_custom_period(self):
+        content = BoxLayout(orientation="vertical", padding=dp(8), spacing=dp(8))
+        inp_from = TextInput(hint_text="С (дд.мм.гггг)", multiline=False, size_hint_y=None, height=dp(40))
+        inp_to = TextInput(hint_text="По (дд.мм.гггг)", multiline=False, size_hint_y=None, height=dp(40))
+        btn_ok = Button(text="Показать", size_hint_y=None, height=dp(44))
+        content.add_widget(inp_from)
+        content.add_widget(inp_to)
+        content.add_widget(btn_ok)
+        popup = Popup(title="Период", content=content, size_hint=(0.7, 0.5), auto_dismiss=True)
+        applied = []
+
+        def apply(*a):
             try:
-                dt = datetime.strptime(date_str, "%d.%m.%Y %H:%M")
-            except:
-                try:
-                    dt = datetime.strptime(date_str.split()[0], "%d.%m.%Y")
-                except:
-                    dt = None
-            if dt:
-                daily[dt.date()] += amount
+                first = datetime.strptime(inp_from.text.strip(), "%d.%m.%Y").date()
+                last = datetime.strptime(inp_to.text.strip(), "%d.%m.%Y").date()
+            except ValueError:
+                popup.title = "Период: даты в формате дд.мм.гггг"
+                return
+            if last < first:
+                first, last = last, first
+            self.period = "custom"
+            self.custom_range = day_bounds(first, last)
+            self._custom_text = f"{first:%d.%m.%Y} – {last:%d.%m.%Y}"
+            applied.append(True)
+            popup.dismiss()
+
+        def restore(*a):
+            # подпись спиннера — выбранный период (или прежний, если диалог закрыли)
+            self.period_spinner.text = self._period_text()
+            if applied:
+                self.refresh()
+
+        btn_ok.bind(on_press=apply)
+        popup.bind(on_dismiss=restore)
+        popup.open()
+
+    def date_range(self):
+        """(date_from, date_to) выбранного периода в метках ts; пресеты пересчитываются на текущую дату."""
+        if self.period == "custom":
+            return self.custom_range
+        return period_bounds(self.period)
+
+    @timed("analytics.refresh")
+    def refresh(self):
+        # запросы уходят в фоновый поток, экран перерисуется, когда придут данные
+        self._refresh_seq += 1
+        seq = self._refresh_seq
+        if not self._loaded:
+            self.details_grid.clear_widgets()
+            self.details_grid.add_widget(Label(text="Загрузка...", size_hint_y=None, height=dp(40)))
+        date_from, date_to = self.date_range()
+        App.get_running_app().db_async.submit(self._query, self.mode, self.member_spinner.text, date_from, date_to,
+                                              callback=lambda res: self._render(seq, res),
+                                              errback=lambda exc: self._render_error(seq, exc))
+
+    @timed("analytics.query")
+    def _query(self, db_loc, mode, selected_member, date_from=None, date_to=None):
+        """Выполняется в фоновом потоке: только запросы к базе и кэш, без виджетов."""
+        return self._report.query(db_loc, mode, selected_member, date_from, date_to)
+
+    def _render_error(self, seq, exc):
+        Logger.exception("AnalyticsScreen: не удалось получить данные", exc_info=exc)
+        if seq != self._refresh_seq:
+            return
+        self.details_grid.clear_widgets()
+        self.details_grid.add_widget(Label(text="Не удалось загрузить данные. Обновите экран или смените период",
+                                           size_hint_y=None, height=dp(40)))
+
+    def _render(self, seq, res):
+        if seq != self._refresh_seq:
+            # ответ на устаревший запрос (режим или участник уже сменились)
+            return
+        self._loaded = True
+        self.member_spinner.values = res["members"]
+        if self.member_spinner.text not in res["members"]:
+            self.member_spinner.text = ALL_MEMBERS
+        data_by_cat = res["categories"]
 
         # pie
-        self.pie.set_data(dict(data_by_cat))
-        # trend: convert daily to sorted list
-        if daily:
-            ordered = OrderedDict(sorted(daily.items()))
-            points = [(datetime.combine(d, datetime.min.time()), v) for d, v in ordered.items()]
-            self.line.set_points(points)
-        else:
-            self.line.set_points([])
+        self.pie.set_data(data_by_cat)
+        # trend: points are already sorted by day
+        self.line.set_points(res["points"])
 
         # details
         self.details_grid.clear_widgets()
@@ -198,5 +307,10 @@ class AnalyticsScreen(Screen):
                 lbl.bind(size=lbl.setter("text_size"))
                 self.details_grid.add_widget(lbl)
 
+    @timed("analytics.on_pre_enter")
     def on_pre_enter(self, *args):
-        Clock.schedule_once(lambda dt: self.refresh(), 0.05)
\ No newline at end of file
+        # режим и период меняются кнопками экрана с явным refresh, здесь — только новые данные
+        if self._changes is None:
+            self._changes = DirtyFlag(self.db or App.get_running_app().db, MEMBER_EVENTS | {HISTORY_ADDED})
+        if self._changes.consume():
+            Clock.schedule_once(lambda dt: self.refresh(), 0.05)
\ No newline at end of file
@@ -0,0 +1,72 @@
+# analytics_cache.py
+"""
+Кэш результатов аналитики: суммы по категориям и по дням
+для ключа (пользователь, режим, участники, диапазон дат).
+
+Запись кэша помнит метку Database.data_version(), наибольший history.id, который
+в неё вошёл, и счётчик изменений history_changes (его ведут триггеры на UPDATE и DELETE):
+  - метка не изменилась — результат отдаётся без запросов к history;
+  - счётчик и состав участников прежние — записи только добавлялись,
+    к результату досчитываются строки с id > max_id;
+  - иначе (правка или удаление записи, в т.ч. другим процессом, изменение состава участников) — полный пересчёт.
+Кэш не зависит от Kivy; обращаться к нему нужно из одного потока (метка data_version своя у соединения).
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+MAX_ENTRIES = 32
+
+
+class AnalyticsCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Any, ...], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, db, mode: str, member_ids: Optional[List[Optional[int]]] = None,
+            date_from: Optional[int] = None, date_to: Optional[int] = None) -> Tuple[Dict[str, float], List[Tuple[str, float]]]:
+        """
+        ({category: total}, [("YYYY-MM-DD", total), ...]) — то же, что
+        get_category_totals / get_daily_totals, но с учётом кэша.
+        """
+        members_key = None if member_ids is None else tuple(sorted(member_ids, key=lambda m: (m is not None, m or 0)))
+        key = (db.current_user_id, mode, members_key, date_from, date_to)
+        stamp = (db.data_version(), db.members_generation)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and entry["stamp"] == stamp:
+            return self._result(entry)
+
+        with db.read_snapshot():
+            max_id, changes = db.get_history_stats()
+            if (entry is not None and entry["stamp"][1] == stamp[1]
+                    and changes == entry["changes"] and max_id >= entry["max_id"]):
+                # только новые записи: досчитываем их к прежним суммам
+                categories = dict(entry["categories"])
+                daily = dict(entry["daily"])
+                for cat, day, amount in db.get_totals_after(entry["max_id"], mode, member_ids, date_from, date_to):
+                    categories[cat] = categories.get(cat, 0.0) + amount
+                    if day is not None:
+                        daily[day] = daily.get(day, 0.0) + amount
+            else:
+                categories = dict(db.get_category_totals(mode, member_ids, date_from, date_to))
+                daily = dict(db.get_daily_totals(mode, member_ids, date_from, date_to))
+
+        entry = {"stamp": stamp, "max_id": max_id, "changes": changes, "categories": categories, "daily": daily}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return self._result(entry)
+
+    @staticmethod
+    def _result(entry: Dict[str, Any]) -> Tuple[Dict[str, float], List[Tuple[str, float]]]:
+        return dict(entry["categories"]), sorted(entry["daily"].items())
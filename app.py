@@ -1,40 +1,97 @@
 # app.py
+import importlib
+import os
+
 from kivy.app import App
-from kivy.uix.screenmanager import ScreenManager
+from kivy.core.window import Window
+from screen_manager import LazyScreenManager
 from welcome import WelcomeScreen
-from main_screen import MainScreen
-from login import LoginScreen
-from analytics import AnalyticsScreen
-from income import IncomeScreen
-from expense import ExpenseScreen
-from history import HistoryScreen
-from goal import GoalScreen
-from family import FamilyScreen
-from database import Database
+
+# экраны, которые строятся при первом показе: name -> (модуль, класс, нужен ли db)
+SCREENS = {
+    "login": ("login", "LoginScreen", False),
+    "main": ("main_screen", "MainScreen", False),
+    "analytics": ("analytics", "AnalyticsScreen", True),
+    "income": ("income", "IncomeScreen", True),
+    "expense": ("expense", "ExpenseScreen", True),
+    "history": ("history", "HistoryScreen", True),
+    "goal": ("goal", "GoalScreen", True),
+    "family": ("family", "FamilyScreen", True),
+    # скрытый экран статистики запросов и экранов (F12)
+    "debug": ("debug_screen", "DebugScreen", True),
+}
+DEBUG_KEY = 293  # F12
 
 class FUApp(App):
+    _db = None
+    _db_async = None
+    profiler = None
+
+    # база и фоновый исполнитель открываются при первом обращении (вход/регистрация),
+    # а не до первого кадра WelcomeScreen
+    @property
+    def db(self):
+        if self._db is None:
+            from database import Database
+            self._db = Database()
+        return self._db
+
+    @property
+    def db_async(self):
+        if self._db_async is None:
+            from db_worker import AsyncDatabase
+            # фоновые запросы экранов, чтобы не блокировать главный поток
+            self._db_async = AsyncDatabase(self.db)
+        return self._db_async
+
+    def _screen_factory(self, name, module, cls, needs_db):
+        def factory():
+            screen_cls = getattr(importlib.import_module(module), cls)
+            if needs_db:
+                return screen_cls(name=name, db=self.db)
+            return screen_cls(name=name)
+        return factory
+
     def build(self):
         self.title = "Финансовый ассистент"
-        self.db = Database()
 
-        self.manager = ScreenManager()
+        self.manager = LazyScreenManager()
         self.manager.add_widget(WelcomeScreen(name="welcome"))
-        self.manager.add_widget(LoginScreen(name="login"))
-        self.manager.add_widget(MainScreen(name="main"))
-        self.manager.add_widget(AnalyticsScreen(name="analytics", db=self.db))
-        self.manager.add_widget(IncomeScreen(name="income", db=self.db))
-        self.manager.add_widget(ExpenseScreen(name="expense", db=self.db))
-        self.manager.add_widget(HistoryScreen(name="history", db=self.db))
-        self.manager.add_widget(GoalScreen(name="goal", db=self.db))
-        self.manager.add_widget(FamilyScreen(name="family", db=self.db))
+        for name, (module, cls, needs_db) in SCREENS.items():
+            self.manager.register(name, self._screen_factory(name, module, cls, needs_db))
+        Window.bind(on_key_down=self._on_key_down)
 
         return self.manager
 
+    def on_start(self):
+        # FU_PROFILE=1 — время кадров, виджеты и память поверх окна (см. ui_profiler.py);
+        # после build, чтобы надпись оказалась над корневым виджетом
+        if os.environ.get("FU_PROFILE"):
+            from ui_profiler import UIProfiler
+            self.profiler = UIProfiler(self.manager, os.environ.get("FU_PROFILE_OUT"))
+            self.profiler.start()
+
+    def _on_key_down(self, window, key, *args):
+        if key == DEBUG_KEY and self.manager.current != "debug":
+            previous = self.manager.current
+            self.manager.current = "debug"
+            self.manager.current_screen.previous = previous
+            return True
+        return False
+
     def on_stop(self):
-        try:
-            self.db.close()
-        except Exception:
-            pass
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self._db_async is not None:
+            try:
+                self._db_async.shutdown()
+            except Exception:
+                pass
+        if self._db is not None:
+            try:
+                self._db.close()
+            except Exception:
+                pass
 
 if __name__ == "__main__":
     FUApp().run()
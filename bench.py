@@ -0,0 +1,173 @@
+# bench.py
+"""
+Замеры Database и фоновой части экранов на больших данных; результат — JSON для сравнения между версиями.
+
+  python bench.py --rows 1000000 --users 4 --out results.json   (база генерируется synthetic.py)
+  python bench.py --db finance.db --out results.json            (замеры идут на копии базы)
+
+Экранные замеры (analytics_refresh_*, history_update_list) повторяют то, что экраны
+выполняют в фоновом потоке App.db_async, без построения виджетов — Kivy для них не нужен.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from database import Database
+from reports import AnalyticsReport
+from synthetic import generate
+
+HISTORY_PAGE_SIZE = 50
+SQL_TOP = 20
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5, ops: Optional[int] = None) -> Dict[str, Any]:
+    """Время fn() в миллисекундах за repeat запусков; ops — число операций в одном запуске (для ops_per_s)."""
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1000)
+    res = {"repeat": repeat, "min_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3),
+           "mean_ms": round(statistics.fmean(times), 3), "max_ms": round(max(times), 3)}
+    if ops:
+        res["ops"] = ops
+        res["ops_per_s"] = round(ops / (min(times) / 1000), 1) if min(times) > 0 else None
+    return res
+
+
+def _heaviest_user(db: Database) -> Optional[int]:
+    row = db._execute("SELECT user_id FROM history GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+
+def _history_update_list(db: Database):
+    # HistoryListView._fetch_page: первая страница и имена участников для строк
+    rows = db.get_history_page(None, HISTORY_PAGE_SIZE)
+    return [db.get_member_name(r[6]) for r in rows]
+
+
+def _analytics_refresh(db: Database, report: AnalyticsReport, mode: str = "expense"):
+    # AnalyticsScreen._query для "Все участники"
+    return report.query(db, mode)
+
+
+def run(db: Database, repeat: int = 5, inserts: int = 200, batch: int = 10000) -> Dict[str, Dict[str, Any]]:
+    """Выполняет замеры для пользователя с наибольшей историей. Меняет базу (замеры записи)."""
+    db.current_user_id = _heaviest_user(db)
+    if db.current_user_id is None:
+        raise RuntimeError("history пуста — сначала заполните базу (synthetic.py)")
+    members = db.get_family_members()
+    member_id = next((m["id"] for m in members if m["name"] != "Я"), None)
+    warm = AnalyticsReport()
+    _analytics_refresh(db, warm)
+
+    results = {
+        "get_history": measure(db.get_history, repeat),
+        "iter_history": measure(lambda: sum(1 for _ in db.iter_history()), repeat),
+        "get_all_members_with_summary": measure(db.get_all_members_with_summary, repeat),
+        "get_member_summary": measure(lambda: db.get_member_summary(member_id), repeat),
+        "get_member_summary_me": measure(lambda: db.get_member_summary(None), repeat),
+        "history_update_list": measure(lambda: _history_update_list(db), repeat),
+        "analytics_refresh_cold": measure(lambda: _analytics_refresh(db, AnalyticsReport()), repeat),
+        "analytics_refresh_warm": measure(lambda: _analytics_refresh(db, warm), repeat),
+        "analytics_refresh_income": measure(lambda: _analytics_refresh(db, AnalyticsReport(), "income"), repeat),
+    }
+
+    # запись: по одной транзакции на add_history и один пакет add_history_many
+    def single():
+        for _ in range(inserts):
+            db.add_history("expense", 1, "Прочее", "bench", None, member_id)
+
+    rows = [("expense", 1, "Прочее", "bench", None, None)] * batch
+    results["add_history"] = measure(single, 1, inserts)
+    results["add_history_many"] = measure(lambda: db.add_history_many(rows), 1, batch)
+    # после записи кэш аналитики досчитывает только новые строки
+    results["analytics_refresh_after_insert"] = measure(lambda: _analytics_refresh(db, warm), 1)
+    return results
+
+
+def _copy_db(src: str, dst: str):
+    """Копия базы через backup API (исходный файл не меняется и не мигрирует)."""
+    s = sqlite3.connect(src)
+    d = sqlite3.connect(dst)
+    try:
+        s.backup(d)
+    finally:
+        d.close()
+        s.close()
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        import subprocess
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Замеры производительности Database и экранов")
+    parser.add_argument("--db", help="существующая база (замеры на её копии); без него база генерируется")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--members", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--inserts", type=int, default=200, help="число одиночных add_history")
+    parser.add_argument("--out", help="файл для JSON (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="fu-bench-")
+    path = os.path.join(tmp, "bench.db")
+    meta: Dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+    }
+    try:
+        if args.db:
+            _copy_db(args.db, path)
+            meta["source"] = os.path.abspath(args.db)
+            db = Database(path, slow_ms=None)
+        else:
+            db = Database(path, slow_ms=None)
+            t = time.perf_counter()
+            generate(db, args.users, args.members, args.rows, args.seed)
+            meta.update({"users": args.users, "members": args.members, "rows": args.rows, "seed": args.seed,
+                         "generate_s": round(time.perf_counter() - t, 2)})
+        try:
+            db.stats.reset()
+            results = run(db, args.repeat, args.inserts)
+            # самые дорогие запросы за время замеров (см. profiling.Stats)
+            sql = db.stats.snapshot()[:SQL_TOP]
+            meta["user_rows"] = len(db.get_history())
+        finally:
+            db.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    out = json.dumps({"meta": meta, "results": results, "sql": sql}, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fp:
+            fp.write(out + "\n")
+    else:
+        print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,205 @@
+# cli.py
+"""
+Командная строка без Kivy: импорт, экспорт, отчёты, обслуживание базы, замеры и HTTP-сервис.
+
+  python cli.py --user anna import history.csv
+  python cli.py --user anna export history.jsonl
+  python cli.py --user anna report --period month
+  python cli.py --user anna report --from 01.01.2024 --to 31.12.2024 --json
+  python cli.py maintenance --check --rebuild --optimize
+  python cli.py bench --rows 100000 --out results.json
+  python cli.py --db finance.db serve --port 8765
+
+Пароль берётся из --password, переменной FU_PASSWORD или запрашивается в терминале.
+Формат файла (csv / json — JSON Lines) определяется по расширению или задаётся --format;
+"-" вместо файла — stdin / stdout.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from typing import List, Optional
+
+import history_io
+from database import DB_DEFAULT, Database
+from reports import AnalyticsReport, summary
+from timeseries import PERIODS, day_bounds, period_bounds
+
+
+class CliError(Exception):
+    pass
+
+
+def _format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".json", ".jsonl"):
+        return "json"
+    raise CliError(f"Не удалось определить формат {path!r}: укажите --format csv или json")
+
+
+def _login(db: Database, args):
+    if not args.user:
+        raise CliError("Укажите пользователя: --user")
+    password = args.password or os.environ.get("FU_PASSWORD")
+    if password is None:
+        import getpass
+        password = getpass.getpass(f"Пароль {args.user}: ")
+    if not db.login_user(args.user, password):
+        raise CliError(f"Неверный логин или пароль: {args.user}")
+
+
+def _parse_day(text: str):
+    try:
+        return datetime.strptime(text, "%d.%m.%Y").date()
+    except ValueError:
+        raise CliError(f"Дата {text!r}: нужен формат дд.мм.гггг")
+
+
+# ---------- команды ----------
+def cmd_import(db: Database, args) -> int:
+    _login(db, args)
+    fmt = _format(args.file, args.format) if args.file != "-" else (args.format or "csv")
+    load = history_io.import_csv if fmt == "csv" else history_io.import_json
+    if args.file == "-":
+        n = load(db, sys.stdin, args.batch_size)
+    else:
+        with open(args.file, encoding="utf-8", newline="") as fp:
+            n = load(db, fp, args.batch_size)
+    print(f"Импортировано записей: {n}", file=sys.stderr)
+    return 0
+
+
+def cmd_export(db: Database, args) -> int:
+    _login(db, args)
+    fmt = _format(args.file, args.format) if args.file != "-" else (args.format or "csv")
+    dump = history_io.export_csv if fmt == "csv" else history_io.export_json
+    if args.file == "-":
+        n = dump(db, sys.stdout, ttype=args.type)
+    else:
+        with open(args.file, "w", encoding="utf-8", newline="") as fp:
+            n = dump(db, fp, ttype=args.type)
+    print(f"Экспортировано записей: {n}", file=sys.stderr)
+    return 0
+
+
+def cmd_report(db: Database, args) -> int:
+    _login(db, args)
+    if args.date_from or args.date_to:
+        if not (args.date_from and args.date_to):
+            raise CliError("Для своего периода нужны и --from, и --to")
+        first, last = sorted((_parse_day(args.date_from), _parse_day(args.date_to)))
+        date_from, date_to = day_bounds(first, last)
+    else:
+        date_from, date_to = period_bounds(args.period)
+    res = summary(db, date_from, date_to, AnalyticsReport(columnar=args.engine == "numpy"))
+    if args.json:
+        print(json.dumps(res, ensure_ascii=False, indent=2))
+        return 0
+    print(f"Баланс: {res['balance']:.2f} ₽, цель: {res['goal']:.2f} ₽")
+    print("Участники:")
+    for m in res["members"]:
+        print(f"  {m['name']}: доход {m['income']:.2f}, расход {m['expense']:.2f}")
+    for mode, title in (("income", "Доходы"), ("expense", "Расходы")):
+        print(f"{title} за период: {res[mode]['total']:.2f} ₽")
+        for cat, val in res[mode]["categories"].items():
+            print(f"  {cat}: {val:.2f}")
+    return 0
+
+
+def cmd_maintenance(db: Database, args) -> int:
+    # без флагов — проверка и оптимизация
+    if not (args.check or args.rebuild or args.optimize or args.vacuum):
+        args.check = args.optimize = True
+    status = 0
+    if args.check:
+        problems = db.integrity_check()
+        for p in problems:
+            print(p)
+        print("Проверка: " + (f"найдено ошибок: {len(problems)}" if problems else "ошибок нет"), file=sys.stderr)
+        status = 1 if problems else 0
+    if args.rebuild:
+        db.rebuild_aggregates()
+        print("Агрегаты member_balance и daily_rollup пересчитаны", file=sys.stderr)
+    if args.optimize:
+        db.optimize()
+        print("PRAGMA optimize и checkpoint выполнены", file=sys.stderr)
+    if args.vacuum:
+        db.vacuum()
+        print("VACUUM выполнен", file=sys.stderr)
+    return status
+
+
+COMMANDS = {"import": cmd_import, "export": cmd_export, "report": cmd_report, "maintenance": cmd_maintenance}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Финансы семьи: работа с базой без интерфейса")
+    parser.add_argument("--db", default=DB_DEFAULT, help=f"файл базы (по умолчанию {DB_DEFAULT})")
+    parser.add_argument("--user", help="имя пользователя (для import, export, report)")
+    parser.add_argument("--password", help="пароль (иначе FU_PASSWORD или запрос в терминале)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="загрузить историю из CSV или JSON Lines")
+    p.add_argument("file", help="файл или - (stdin)")
+    p.add_argument("--format", choices=("csv", "json"))
+    p.add_argument("--batch-size", type=int, default=history_io.BATCH_SIZE)
+
+    p = sub.add_parser("export", help="выгрузить историю в CSV или JSON Lines")
+    p.add_argument("file", nargs="?", default="-", help="файл или - (stdout, по умолчанию)")
+    p.add_argument("--format", choices=("csv", "json"))
+    p.add_argument("--type", choices=("income", "expense"), help="только доходы или только расходы")
+
+    p = sub.add_parser("report", help="сводка: баланс, участники, суммы по категориям")
+    p.add_argument("--period", choices=PERIODS, default="all")
+    p.add_argument("--from", dest="date_from", help="начало своего периода, дд.мм.гггг")
+    p.add_argument("--to", dest="date_to", help="конец своего периода (включительно), дд.мм.гггг")
+    p.add_argument("--engine", choices=("sql", "numpy"), default="sql")
+    p.add_argument("--json", action="store_true", help="вывести JSON")
+
+    p = sub.add_parser("maintenance", help="проверка и обслуживание файла базы")
+    p.add_argument("--check", action="store_true", help="integrity_check и foreign_key_check")
+    p.add_argument("--rebuild", action="store_true", help="пересчитать member_balance и daily_rollup")
+    p.add_argument("--optimize", action="store_true", help="PRAGMA optimize и checkpoint WAL")
+    p.add_argument("--vacuum", action="store_true", help="VACUUM (пересборка файла)")
+
+    # аргументы передаются bench.py и server.py как есть
+    sub.add_parser("bench", help="замеры производительности (см. python bench.py --help)", add_help=False)
+    sub.add_parser("serve", help="HTTP/JSON-сервис (см. python server.py --help)", add_help=False)
+    return parser
+
+
+def main(argv: List[str]) -> int:
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if args.command == "bench":
+        # bench.py работает на своей (сгенерированной или скопированной) базе
+        import bench
+        return bench.main(rest)
+    if args.command == "serve":
+        import server
+        return server.main(["--db", args.db] + rest)
+    if rest:
+        parser.error("лишние аргументы: " + " ".join(rest))
+    if args.command != "import" and not os.path.exists(args.db):
+        print(f"Ошибка: нет файла базы {args.db}", file=sys.stderr)
+        return 2
+    db = Database(args.db, slow_ms=None)
+    try:
+        return COMMANDS[args.command](db, args)
+    except CliError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
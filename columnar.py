@@ -0,0 +1,226 @@
+# columnar.py
+"""
+Колоночный снимок истории пользователя для тяжёлой аналитики (необязательно, нужен NumPy).
+
+ColumnarHistory.load(db) один раз читает history текущего пользователя в массивы:
+ts (секунды, см. database.date_to_ts; до 1970 года — отрицательные), amount, код категории,
+member_id, тип и маска dated (у записи есть ts). Датированные записи идут первыми
+по возрастанию ts, поэтому диапазон дат — это срез через searchsorted, а суммы
+по категориям, дням/неделям/месяцам и участникам — bincount.
+
+Результаты в форматах виджетов аналитики:
+  category_totals() -> {category: total}            (PieWidget.set_data)
+  bucket_totals()   -> [(datetime, total), ...]     (LineWidget.set_points)
+
+Без NumPy HAVE_NUMPY = False, а totals() считает через SQL (get_category_totals / get_daily_totals).
+
+Сравнение с построчным циклом прежнего AnalyticsScreen.refresh и с SQL:
+  python columnar.py finance.db
+  python columnar.py --synthetic 200000
+"""
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен
+    np = None
+
+HAVE_NUMPY = np is not None
+EPOCH = datetime(1970, 1, 1)
+BUCKETS = ("day", "week", "month")
+DAY = 86400
+
+
+class ColumnarHistory:
+    """Неизменяемый снимок history одного пользователя в массивах NumPy."""
+
+    def __init__(self, user_id: Optional[int], stamp: Any, categories: List[str],
+                 ts, amount, cat, member, income, dated):
+        self.user_id = user_id
+        self.stamp = stamp
+        self.categories = categories
+        # датированные записи (по возрастанию ts) и за ними — без даты (их ts не используется)
+        order = np.lexsort((ts, ~dated))
+        self._dated = int(np.count_nonzero(dated))
+        self.ts = ts[order]
+        self.amount = amount[order]
+        self.cat = cat[order]
+        self.member = member[order]
+        self.income = income[order]
+
+    def __len__(self):
+        return len(self.ts)
+
+    @classmethod
+    def load(cls, db, chunk_size: int = 10000) -> "ColumnarHistory":
+        if not HAVE_NUMPY:
+            raise RuntimeError("Для колоночного снимка нужен NumPy")
+        codes: Dict[str, int] = {}
+        ts: List[int] = []
+        amount: List[float] = []
+        cat: List[int] = []
+        member: List[int] = []
+        income: List[bool] = []
+        dated: List[bool] = []
+        stamp = (db.data_version(), db.members_generation)
+        with db.read_snapshot():
+            for rows in db.iter_history_columns(chunk_size):
+                for _id, typ, t, a, c, m in rows:
+                    ts.append(0 if t is None else t)
+                    dated.append(t is not None)
+                    amount.append(a)
+                    cat.append(codes.setdefault(c, len(codes)))
+                    member.append(0 if m is None else m)
+                    income.append(typ == "income")
+        return cls(db.current_user_id, stamp, list(codes),
+                   np.array(ts, dtype=np.int64), np.array(amount, dtype=np.float64),
+                   np.array(cat, dtype=np.int32), np.array(member, dtype=np.int64),
+                   np.array(income, dtype=bool), np.array(dated, dtype=bool))
+
+    def is_current(self, db) -> bool:
+        """Снимок соответствует базе (тот же пользователь, данные не менялись)."""
+        return self.user_id == db.current_user_id and self.stamp == (db.data_version(), db.members_generation)
+
+    # ---------- выборка ----------
+    def _select(self, ttype: str, member_ids: Optional[List[Optional[int]]],
+                date_from: Optional[int], date_to: Optional[int], dated_only: bool = False):
+        """Срез по диапазону дат (searchsorted) и маска по типу и участникам."""
+        if date_from is None and date_to is None and not dated_only:
+            lo, hi = 0, len(self.ts)
+        else:
+            dated = self.ts[:self._dated]
+            lo = 0 if date_from is None else int(np.searchsorted(dated, date_from, "left"))
+            hi = self._dated if date_to is None else int(np.searchsorted(dated, date_to, "left"))
+        sl = slice(lo, max(lo, hi))
+        mask = self.income[sl] if ttype == "income" else ~self.income[sl]
+        if member_ids is not None:
+            mask = mask & np.isin(self.member[sl], [0 if m is None else m for m in member_ids])
+        return sl, mask
+
+    def category_totals(self, ttype: str, member_ids: Optional[List[Optional[int]]] = None,
+                        date_from: Optional[int] = None, date_to: Optional[int] = None) -> Dict[str, float]:
+        """{category: total} по убыванию суммы, как get_category_totals."""
+        sl, mask = self._select(ttype, member_ids, date_from, date_to)
+        sums = np.bincount(self.cat[sl][mask], weights=self.amount[sl][mask], minlength=len(self.categories))
+        counts = np.bincount(self.cat[sl][mask], minlength=len(self.categories))
+        order = np.argsort(-sums, kind="stable")
+        return {self.categories[i]: float(sums[i]) for i in order if counts[i]}
+
+    def bucket_totals(self, ttype: str, bucket: str = "day", member_ids: Optional[List[Optional[int]]] = None,
+                      date_from: Optional[int] = None, date_to: Optional[int] = None) -> List[Tuple[datetime, float]]:
+        """[(начало дня/недели/месяца, total), ...] по возрастанию; записи без даты не учитываются."""
+        if bucket not in BUCKETS:
+            raise ValueError(f"Неизвестный интервал: {bucket!r}")
+        sl, mask = self._select(ttype, member_ids, date_from, date_to, dated_only=True)
+        ts = self.ts[sl][mask]
+        if not len(ts):
+            return []
+        days = ts // DAY
+        if bucket == "day":
+            keys = days
+        elif bucket == "week":
+            # 1970-01-01 — четверг; +3 выравнивает недели по понедельникам
+            keys = (days + 3) // 7 * 7 - 3
+        else:
+            keys = ts.astype("datetime64[s]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+        # ts отсортированы, значит и ключи тоже: границы групп — там, где ключ меняется
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sums = np.add.reduceat(self.amount[sl][mask], starts)
+        return [(EPOCH + timedelta(days=int(k)), float(v)) for k, v in zip(keys[starts], sums)]
+
+    def member_totals(self, ttype: str, date_from: Optional[int] = None,
+                      date_to: Optional[int] = None) -> Dict[Optional[int], float]:
+        """{member_id: total}; None — записи без участника ('Я')."""
+        sl, mask = self._select(ttype, None, date_from, date_to)
+        ids, inverse = np.unique(self.member[sl][mask], return_inverse=True)
+        sums = np.bincount(inverse, weights=self.amount[sl][mask], minlength=len(ids))
+        return {(None if m == 0 else int(m)): float(v) for m, v in zip(ids, sums)}
+
+
+def totals(db, ttype: str, member_ids: Optional[List[Optional[int]]] = None,
+           snapshot: Optional[ColumnarHistory] = None) -> Tuple[Dict[str, float], List[Tuple[datetime, float]]]:
+    """
+    Данные для PieWidget и LineWidget: из снимка, если он есть и актуален, иначе через SQL.
+    """
+    if snapshot is not None and snapshot.is_current(db):
+        return snapshot.category_totals(ttype, member_ids), snapshot.bucket_totals(ttype, "day", member_ids)
+    daily = db.get_daily_totals(ttype, member_ids)
+    return (dict(db.get_category_totals(ttype, member_ids)),
+            [(datetime.strptime(d, "%Y-%m-%d"), v) for d, v in daily])
+
+
+# ---------- сравнение ----------
+def _row_loop(db, ttype: str):
+    """Прежний построчный расчёт AnalyticsScreen.refresh (для сравнения)."""
+    data_by_cat: Dict[str, float] = defaultdict(float)
+    daily: Dict[Any, float] = defaultdict(float)
+    for typ, amount, category, desc, date_str, member_id in db.get_history():
+        if typ != ttype:
+            continue
+        db.get_member_name(member_id)
+        data_by_cat[category or "Прочее"] += amount
+        try:
+            dt = datetime.strptime(date_str, "%d.%m.%Y %H:%M")
+        except (ValueError, TypeError):
+            try:
+                dt = datetime.strptime(date_str.split()[0], "%d.%m.%Y")
+            except (ValueError, TypeError, IndexError, AttributeError):
+                dt = None
+        if dt:
+            daily[dt.date()] += amount
+    return dict(data_by_cat), sorted(daily.items())
+
+
+def _bench(label: str, fn, repeat: int = 3):
+    best = min(_timed(fn) for _ in range(repeat))
+    print(f"  {label:<28}{best * 1000:10.1f} ms")
+
+
+def _timed(fn) -> float:
+    t = time.perf_counter()
+    fn()
+    return time.perf_counter() - t
+
+
+def main(argv: List[str]) -> int:
+    import os
+    import tempfile
+    from database import Database
+
+    if argv[:1] == ["--synthetic"]:
+        from synthetic import generate
+        rows = int(argv[1]) if len(argv) > 1 else 100000
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        db = Database(path, slow_ms=None)
+        generate(db, rows=rows)
+    else:
+        db = Database(argv[0] if argv else "finance.db", slow_ms=None)
+    # самый «тяжёлый» пользователь
+    row = db._execute("SELECT user_id FROM history GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    if row is None:
+        print("history пуста")
+        db.close()
+        return 1
+    db.current_user_id = row[0]
+    try:
+        print(f"user_id={db.current_user_id}, записей: {len(db.get_history())}, NumPy: {'да' if HAVE_NUMPY else 'нет'}")
+        _bench("построчный цикл (прежний)", lambda: _row_loop(db, "expense"))
+        _bench("SQL (daily_rollup)", lambda: totals(db, "expense"))
+        if HAVE_NUMPY:
+            _bench("NumPy: загрузка снимка", lambda: ColumnarHistory.load(db), repeat=1)
+            snap = ColumnarHistory.load(db)
+            _bench("NumPy: категории + дни", lambda: totals(db, "expense", snapshot=snap))
+            _bench("NumPy: недели", lambda: snap.bucket_totals("expense", "week"))
+            _bench("NumPy: месяцы", lambda: snap.bucket_totals("expense", "month"))
+            _bench("NumPy: по участникам", lambda: snap.member_totals("expense"))
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,24 +1,320 @@
 # database.py
 import sqlite3
+import calendar
+import itertools
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
 import hashlib
-from typing import List, Dict, Any, Optional, Tuple
+import logging
+from typing import List, Dict, Any, Callable, Optional, Tuple, Iterable, Iterator, Sequence
+import db_events
+from profiling import SLOW_MS, Stats, TracedConnection, sql_log
 
 DB_DEFAULT = "finance.db"
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+DATE_FORMAT = "%d.%m.%Y %H:%M"
+# версия схемы хранится в PRAGMA user_version
+SCHEMA_VERSION = 3
+# метка «у потока нет своего пользователя» (см. Database.session)
+_NO_SESSION = object()
+# номера общих in-memory баз: у каждого Database(":memory:") своя
+_memory_ids = itertools.count(1)
+
+
+@lru_cache(maxsize=4096)
+def date_to_ts(date_str: Optional[str]) -> Optional[int]:
+    """
+    Переводит строку даты ("%d.%m.%Y %H:%M" или "%d.%m.%Y") в целое число секунд.
+    Время локальное и записывается "как UTC" (calendar.timegm), поэтому
+    date(ts, 'unixepoch') в SQLite даёт тот же календарный день, что и строка.
+    Возвращает None, если строку разобрать не удалось.
+    """
+    if not date_str:
+        return None
+    try:
+        dt = datetime.strptime(date_str, DATE_FORMAT)
+    except (ValueError, TypeError):
+        try:
+            dt = datetime.strptime(date_str.split()[0], "%d.%m.%Y")
+        except (ValueError, TypeError, IndexError, AttributeError):
+            return None
+    return calendar.timegm(dt.timetuple())
+
 
 class Database:
-    def __init__(self, db_name: str = DB_DEFAULT):
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
-        self.conn.execute("PRAGMA foreign_keys = ON;")
-        self.cursor = self.conn.cursor()
-        self.current_user_id: Optional[int] = None
+    """
+    Доступ к finance.db, безопасный для нескольких потоков:
+    у каждого потока своё соединение (WAL — читатели не ждут писателя),
+    у каждого запроса свой курсор, а запись сериализуется общей блокировкой.
+
+    Долговечность записи настраивается:
+      commit_delay=None — каждая транзакция фиксируется сразу (по умолчанию);
+      commit_delay=0.2 — групповая фиксация: транзакции копятся и фиксируются
+        одним commit (одним fsync) не позже чем через commit_delay секунд,
+        при вызове flush() или close(), а также перед любым чтением через этот объект.
+        Поэтому транзакция, завершившаяся в любом потоке, видна всем последующим чтениям
+        через этот Database; откладывается только её долговечность, и другие процессы
+        увидят запись лишь после фиксации. Выигрыш — у серий записей без чтений между ними;
+      synchronous — PRAGMA synchronous ("FULL" — переживает отключение питания ценой fsync на каждый commit).
+
+    Текущий пользователь (current_user_id) общий для объекта; поток может работать
+    от имени другого пользователя внутри with db.session(user_id) — так один Database
+    обслуживает запросы разных клиентов (server.py).
+
+    Database(":memory:") — база в памяти, общая для всех потоков этого объекта (shared cache).
+    В ней нет WAL: читатели видят и незафиксированные записи (read_uncommitted), а не снимок.
+
+    Об изменениях данных Database сообщает подписчикам (subscribe, типы событий — в db_events.py).
+
+    Время каждого запроса копится в self.stats (см. profiling.py); запросы дольше slow_ms
+    пишутся в лог "finance.sql" (slow_ms=None — не писать).
+    """
+
+    def __init__(self, db_name: str = DB_DEFAULT, commit_delay: Optional[float] = None, synchronous: str = "NORMAL",
+                 slow_ms: Optional[float] = SLOW_MS):
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Неизвестный режим synchronous: {synchronous!r}")
+        self.db_name = db_name
+        # соединения потоков открывают одну и ту же базу: для ":memory:" — общую in-memory по URI
+        self._memory = db_name == ":memory:"
+        self._uri = f"file:finance-memory-{next(_memory_ids)}?mode=memory&cache=shared" if self._memory else None
+        self.commit_delay = commit_delay
+        self.synchronous = synchronous.upper()
+        self.stats = Stats(slow_ms=slow_ms, logger=sql_log)
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._cache_lock = threading.Lock()
+        # соединение с незафиксированными (отложенными) транзакциями и таймер их фиксации
+        self._pending_conn: Optional[sqlite3.Connection] = None
+        self._flush_timer: Optional[threading.Timer] = None
+        self._user_id: Optional[int] = None
+        # кэш членов семьи: owner_id -> {"list", "by_id", "by_name", "other"}; сбрасывается при изменениях
+        self._members_cache: Dict[int, Dict[str, Any]] = {}
+        # счётчик сбросов кэша: не даёт потоку положить в кэш данные, прочитанные до сброса
+        self._members_gen = 0
+        # число завершённых транзакций записи этого объекта (см. data_version)
+        self._writes = 0
+        # подписчики на события изменений: callback(event, user_id)
+        self._subscribers: List[Callable[[str, Optional[int]], None]] = []
+        self._subscribers_lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode = WAL;")
         self.create_tables()
         self._migrate_if_needed()
 
+    # ---------- пользователь ----------
+    @property
+    def current_user_id(self) -> Optional[int]:
+        uid = getattr(self._local, "user_id", _NO_SESSION)
+        return self._user_id if uid is _NO_SESSION else uid
+
+    @current_user_id.setter
+    def current_user_id(self, user_id: Optional[int]):
+        # внутри session() меняется только пользователь потока (например, login_user)
+        if getattr(self._local, "user_id", _NO_SESSION) is _NO_SESSION:
+            self._user_id = user_id
+        else:
+            self._local.user_id = user_id
+
+    @contextmanager
+    def session(self, user_id: Optional[int] = None) -> Iterator[None]:
+        """
+        Свой current_user_id для текущего потока на время with; общий пользователь объекта не меняется.
+            with db.session(user_id):
+                db.add_history(...)
+        """
+        prev = getattr(self._local, "user_id", _NO_SESSION)
+        self._local.user_id = user_id
+        try:
+            yield
+        finally:
+            if prev is _NO_SESSION:
+                del self._local.user_id
+            else:
+                self._local.user_id = prev
+
+    # ---------- соединения ----------
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Соединение текущего потока (создаётся при первом обращении)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False — чтобы close() мог закрыть соединения других потоков
+            conn = sqlite3.connect(self._uri or self.db_name, check_same_thread=False, timeout=30,
+                                   factory=TracedConnection, uri=self._memory)
+            conn.stats = self.stats
+            conn.execute("PRAGMA foreign_keys = ON;")
+            if self._memory:
+                # в shared cache блокировки потабличные: без этого чтение при открытой записи — "table is locked"
+                conn.execute("PRAGMA read_uncommitted = 1;")
+            conn.execute(f"PRAGMA synchronous = {self.synchronous};")
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _execute(self, sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+        """Чтение: отдельный курсор на каждый запрос, на соединении текущего потока."""
+        self._flush_before_read()
+        return self.conn.execute(sql, params)
+
+    def _flush_before_read(self):
+        # Отложенный commit виден только соединению, которое писало, а таймер фиксирует его
+        # из своего потока. Фиксируя до чтения, мы и показываем запись всем потокам, и не даём
+        # таймеру коснуться соединения, пока его поток читает (внутри своей транзакции не нужно).
+        if self._pending_conn is not None and getattr(self._local, "depth", 0) == 0:
+            self.flush()
+
+    # ---------- транзакции ----------
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Транзакция записи: писатель в каждый момент один (общая блокировка).
+        Несколько операций внутри одного with фиксируются вместе:
+            with db.transaction():
+                db.add_history(...)
+                db.set_goal(...)
+        Вложенные transaction() работают как точки сохранения: исключение откатывает
+        только свой уровень. Фиксация внешнего уровня — сразу или отложенно (см. commit_delay).
+        """
+        depth = getattr(self._local, "depth", 0)
+        with self._write_lock:
+            conn = self.conn
+            if depth == 0:
+                # события, опубликованные внутри транзакции, рассылаются после commit
+                self._local.events = []
+                # пока у другого соединения есть отложенная запись, оно держит блокировку SQLite
+                if self._pending_conn is not None and self._pending_conn is not conn:
+                    self._flush_locked()
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+            savepoint = f"tx{depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            queued = len(self._local.events)
+            self._local.depth = depth + 1
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+                # события откатанного уровня не рассылаются
+                del self._local.events[queued:]
+                if depth == 0:
+                    self._local.events = None
+                    if self._pending_conn is not conn:
+                        # отложенных транзакций на этом соединении нет — просто закрываем пустую
+                        conn.rollback()
+                raise
+            else:
+                conn.execute(f"RELEASE {savepoint}")
+                if depth == 0:
+                    self._commit(conn)
+                    self._writes += 1
+            finally:
+                self._local.depth = depth
+        if depth == 0:
+            events, self._local.events = self._local.events, None
+            for event, user_id in dict.fromkeys(events or ()):
+                self._dispatch(event, user_id)
+
+    @contextmanager
+    def read_snapshot(self) -> Iterator[sqlite3.Connection]:
+        """
+        Несколько чтений из одного снимка базы (WAL): записи других соединений,
+        зафиксированные в это время, внутри with не видны.
+        """
+        self._flush_before_read()
+        conn = self.conn
+        if conn.in_transaction:
+            # уже внутри транзакции этого потока — она и есть снимок
+            yield conn
+            return
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.commit()
+
+    def data_version(self) -> Tuple[int, int]:
+        """
+        Метка версии данных для кэшей: меняется после каждой записи через этот объект
+        и после фиксации изменений другим соединением или процессом (PRAGMA data_version).
+        Значение PRAGMA своё у каждого соединения — сравнивать метки одного потока.
+        """
+        return self._writes, self._execute("PRAGMA data_version").fetchone()[0]
+
+    @property
+    def members_generation(self) -> int:
+        """Растёт при каждом сбросе кэша членов семьи (добавление, удаление, вход)."""
+        return self._members_gen
+
+    # ---------- события изменений ----------
+    def subscribe(self, callback: Callable[[str, Optional[int]], None]):
+        """Подписка на события db_events: callback(event, user_id)."""
+        with self._subscribers_lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[str, Optional[int]], None]):
+        with self._subscribers_lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _publish(self, event: str):
+        """Внутри транзакции событие откладывается до commit, вне — рассылается сразу."""
+        events = getattr(self._local, "events", None)
+        if events is not None:
+            events.append((event, self.current_user_id))
+        else:
+            self._dispatch(event, self.current_user_id)
+
+    def _dispatch(self, event: str, user_id: Optional[int]):
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event, user_id)
+            except Exception:
+                logging.getLogger("finance.db").exception("Ошибка подписчика на %s", event)
+
+    def _commit(self, conn: sqlite3.Connection):
+        """Фиксирует транзакцию сразу или откладывает её до общего commit (вызывается под _write_lock)."""
+        if self.commit_delay is None:
+            conn.commit()
+            return
+        self._pending_conn = conn
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.commit_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_locked(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        # _pending_conn сбрасывается только после commit: иначе читатель другого потока
+        # (_flush_before_read смотрит на него без блокировки) прочитал бы ещё старый снимок
+        conn = self._pending_conn
+        if conn is not None:
+            try:
+                conn.commit()
+            finally:
+                self._pending_conn = None
+
+    def flush(self):
+        """Фиксирует отложенные транзакции (групповой commit)."""
+        with self._write_lock:
+            self._flush_locked()
+
     # ---------- создание таблиц ----------
     def create_tables(self):
+        # вызывается из __init__, до появления других потоков
+        conn = self.conn
         # users
-        self.cursor.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 username TEXT UNIQUE NOT NULL,
@@ -26,7 +322,7 @@ class Database:
             )
         """)
         # balance
-        self.cursor.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS balance (
                 user_id INTEGER PRIMARY KEY,
                 amount REAL DEFAULT 0,
@@ -34,7 +330,7 @@ class Database:
             )
         """)
         # family_members (таблица членов семьи)
-        self.cursor.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS family_members (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 owner_id INTEGER NOT NULL,
@@ -45,8 +341,8 @@ class Database:
                 FOREIGN KEY(owner_id) REFERENCES users(id) ON DELETE CASCADE
             )
         """)
-        # history (операции) — содержит member_id (миграция добавит, если её не было ранее)
-        self.cursor.execute("""
+        # history (операции) — содержит member_id и ts (миграция добавит, если их не было ранее)
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL,
@@ -56,36 +352,190 @@ class Database:
                 category TEXT DEFAULT 'Прочее',
                 description TEXT,
                 date TEXT NOT NULL,
+                ts INTEGER,
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
                 FOREIGN KEY (member_id) REFERENCES family_members(id) ON DELETE SET NULL
             )
         """)
         # goals
-        self.cursor.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS goals (
                 user_id INTEGER PRIMARY KEY,
                 target REAL DEFAULT 0,
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
             )
         """)
-        self.conn.commit()
+        # member_balance — суммы доходов/расходов по участникам, ведутся триггерами на history
+        # (member_id = 0 — записи без участника, т.е. 'Я')
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS member_balance (
+                user_id INTEGER NOT NULL,
+                member_id INTEGER NOT NULL DEFAULT 0,
+                income REAL NOT NULL DEFAULT 0,
+                expense REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, member_id),
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        """)
+        # daily_rollup — суммы и число операций по дням и категориям, тоже ведётся триггерами
+        # (day — "YYYY-MM-DD", '' для записей с неразобранной датой; пустая категория — "Прочее")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily_rollup (
+                user_id INTEGER NOT NULL,
+                member_id INTEGER NOT NULL DEFAULT 0,
+                type TEXT NOT NULL,
+                category TEXT NOT NULL,
+                day TEXT NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, type, member_id, day, category),
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        """)
+        # history_changes — счётчик изменений и удалений записей history по пользователю
+        # (ведётся триггерами; добавление записей его не меняет) — по нему кэши аналитики
+        # отличают дописанные строки от правок, в т.ч. сделанных другим процессом;
+        # без внешнего ключа: триггер на DELETE срабатывает и при каскадном удалении пользователя
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS history_changes (
+                user_id INTEGER PRIMARY KEY,
+                changes INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.commit()
 
     # ---------- миграция схемы ----------
     def _migrate_if_needed(self):
-        # Добавим колонку member_id в history, если её нет (без потери данных)
+        conn = self.conn
+        # Добавим колонки member_id и ts в history, если их нет (без потери данных)
         try:
-            self.cursor.execute("PRAGMA table_info(history)")
-            cols = [r[1] for r in self.cursor.fetchall()]
-            if "member_id" not in cols:
-                try:
-                    self.cursor.execute("ALTER TABLE history ADD COLUMN member_id INTEGER;")
-                    self.conn.commit()
-                except Exception:
-                    # если ALTER по какой-то причине не сработал, просто продолжаем
-                    pass
+            cols = [r[1] for r in conn.execute("PRAGMA table_info(history)").fetchall()]
+            for col in ("member_id", "ts"):
+                if col not in cols:
+                    try:
+                        conn.execute(f"ALTER TABLE history ADD COLUMN {col} INTEGER;")
+                        conn.commit()
+                    except Exception:
+                        # если ALTER по какой-то причине не сработал, просто продолжаем
+                        pass
         except Exception:
             pass
 
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # заполняем ts для старых записей одним UPDATE (разбор строки — через date_to_ts)
+            conn.create_function("date_to_ts", 1, date_to_ts, deterministic=True)
+            conn.execute("UPDATE history SET ts = date_to_ts(date) WHERE ts IS NULL")
+        if version < 2:
+            # member_balance заполняется по уже существующей истории, дальше его ведут триггеры
+            self._fill_member_balance(conn)
+        if version < 3:
+            # daily_rollup по уже существующей истории (однократно), дальше — триггеры
+            self._fill_daily_rollup(conn)
+        self._create_triggers()
+        if version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        self._create_indexes()
+
+    @staticmethod
+    def _fill_member_balance(conn: sqlite3.Connection):
+        conn.execute("DELETE FROM member_balance")
+        conn.execute("""
+            INSERT INTO member_balance (user_id, member_id, income, expense)
+            SELECT user_id, IFNULL(member_id, 0),
+                   IFNULL(SUM(CASE WHEN type='income' THEN amount END), 0),
+                   IFNULL(SUM(CASE WHEN type='expense' THEN amount END), 0)
+            FROM history GROUP BY user_id, IFNULL(member_id, 0)
+        """)
+
+    @staticmethod
+    def _fill_daily_rollup(conn: sqlite3.Connection):
+        conn.execute("DELETE FROM daily_rollup")
+        conn.execute("""
+            INSERT INTO daily_rollup (user_id, member_id, type, category, day, total, count)
+            SELECT user_id, IFNULL(member_id, 0), type, COALESCE(NULLIF(category, ''), 'Прочее'),
+                   IFNULL(date(ts, 'unixepoch'), ''), SUM(amount), COUNT(*)
+            FROM history GROUP BY 1, 2, 3, 4, 5
+        """)
+
+    def _create_triggers(self):
+        conn = self.conn
+        # суммы по участнику меняются в той же транзакции, что и сама запись history
+        add_new = """
+            INSERT INTO member_balance (user_id, member_id, income, expense)
+            VALUES (NEW.user_id, IFNULL(NEW.member_id, 0),
+                    CASE WHEN NEW.type='income' THEN NEW.amount ELSE 0 END,
+                    CASE WHEN NEW.type='expense' THEN NEW.amount ELSE 0 END)
+            ON CONFLICT (user_id, member_id) DO UPDATE SET
+                income = income + excluded.income, expense = expense + excluded.expense;
+        """
+        sub_old = """
+            UPDATE member_balance SET
+                income = income - CASE WHEN OLD.type='income' THEN OLD.amount ELSE 0 END,
+                expense = expense - CASE WHEN OLD.type='expense' THEN OLD.amount ELSE 0 END
+            WHERE user_id = OLD.user_id AND member_id = IFNULL(OLD.member_id, 0);
+        """
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_history_balance_ins AFTER INSERT ON history BEGIN {add_new} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_history_balance_del AFTER DELETE ON history BEGIN {sub_old} END")
+        # в т.ч. ON DELETE SET NULL при удалении участника: его суммы переходят к 'Я'
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS trg_history_balance_upd AFTER UPDATE OF user_id, member_id, type, amount "
+            f"ON history BEGIN {sub_old} {add_new} END"
+        )
+
+        # daily_rollup: ключ строки — (user_id, type, member_id, day, category)
+        key = """user_id = {r}.user_id AND type = {r}.type AND member_id = IFNULL({r}.member_id, 0)
+            AND day = IFNULL(date({r}.ts, 'unixepoch'), '') AND category = COALESCE(NULLIF({r}.category, ''), 'Прочее')"""
+        roll_new = """
+            INSERT INTO daily_rollup (user_id, member_id, type, category, day, total, count)
+            VALUES (NEW.user_id, IFNULL(NEW.member_id, 0), NEW.type, COALESCE(NULLIF(NEW.category, ''), 'Прочее'),
+                    IFNULL(date(NEW.ts, 'unixepoch'), ''), NEW.amount, 1)
+            ON CONFLICT (user_id, type, member_id, day, category) DO UPDATE SET
+                total = total + excluded.total, count = count + 1;
+        """
+        roll_old = f"""
+            UPDATE daily_rollup SET total = total - OLD.amount, count = count - 1 WHERE {key.format(r="OLD")};
+            DELETE FROM daily_rollup WHERE {key.format(r="OLD")} AND count <= 0;
+        """
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_history_rollup_ins AFTER INSERT ON history BEGIN {roll_new} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS trg_history_rollup_del AFTER DELETE ON history BEGIN {roll_old} END")
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS trg_history_rollup_upd "
+            "AFTER UPDATE OF user_id, member_id, type, amount, category, ts "
+            f"ON history BEGIN {roll_old} {roll_new} END"
+        )
+
+        # history_changes: +1 старому и новому владельцу при каждом UPDATE / DELETE
+        bump = """
+            INSERT INTO history_changes (user_id, changes) VALUES ({r}.user_id, 1)
+            ON CONFLICT (user_id) DO UPDATE SET changes = changes + 1;
+        """
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS trg_history_changes_del AFTER DELETE ON history BEGIN {bump.format(r='OLD')} END"
+        )
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS trg_history_changes_upd "
+            "AFTER UPDATE OF user_id, member_id, type, amount, category, ts "
+            f"ON history BEGIN {bump.format(r='OLD')} {bump.format(r='NEW')} END"
+        )
+
+    def _create_indexes(self):
+        conn = self.conn
+        # составные индексы: выборки по пользователю, типу, участнику и диапазону дат
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_history_user_type_member_ts ON history (user_id, type, member_id, ts)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_user_ts ON history (user_id, ts)")
+        # (user_id, rowid) — постраничный вывод истории по убыванию id
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_user ON history (user_id)")
+        # (user_id, type, rowid) — те же страницы, но только доходы или только расходы
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_history_user_type ON history (user_id, type)")
+        # daily_rollup за период без фильтра по участнику (в первичном ключе между type и day стоит member_id)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_rollup_user_type_day ON daily_rollup (user_id, type, day)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_family_members_owner ON family_members (owner_id)")
+        conn.commit()
+
     # ---------- пароли ----------
     def _hash_password(self, password: str) -> str:
         return hashlib.sha256(password.encode("utf-8")).hexdigest()
@@ -98,17 +548,17 @@ class Database:
         """
         try:
             ph = self._hash_password(password)
-            self.cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, ph))
-            user_id = self.cursor.lastrowid
-            # инициализация баланса и цели
-            self.cursor.execute("INSERT OR REPLACE INTO balance (user_id, amount) VALUES (?, ?)", (user_id, 0.0))
-            self.cursor.execute("INSERT OR REPLACE INTO goals (user_id, target) VALUES (?, ?)", (user_id, 0.0))
-            # создаём default member "Я"
-            self.cursor.execute(
-                "INSERT INTO family_members (owner_id, name, role, color, avatar) VALUES (?, ?, ?, ?, ?)",
-                (user_id, "Я", "Владелец", "#6C5CE7", "")
-            )
-            self.conn.commit()
+            with self.transaction() as conn:
+                user_id = conn.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, ph)).lastrowid
+                # инициализация баланса и цели
+                conn.execute("INSERT OR REPLACE INTO balance (user_id, amount) VALUES (?, ?)", (user_id, 0.0))
+                conn.execute("INSERT OR REPLACE INTO goals (user_id, target) VALUES (?, ?)", (user_id, 0.0))
+                # создаём default member "Я"
+                conn.execute(
+                    "INSERT INTO family_members (owner_id, name, role, color, avatar) VALUES (?, ?, ?, ?, ?)",
+                    (user_id, "Я", "Владелец", "#6C5CE7", "")
+                )
+            self._invalidate_members(user_id)
             return True
         except sqlite3.IntegrityError:
             return False
@@ -121,26 +571,27 @@ class Database:
         Гарантирует наличие записей balance/goals и хотя бы одного family_member.
         """
         ph = self._hash_password(password)
-        self.cursor.execute("SELECT id FROM users WHERE username=? AND password_hash=?", (username, ph))
-        row = self.cursor.fetchone()
+        row = self._execute("SELECT id FROM users WHERE username=? AND password_hash=?", (username, ph)).fetchone()
         if row:
             self.current_user_id = int(row[0])
-            # ensure balance and goals
-            self.cursor.execute("INSERT OR IGNORE INTO balance (user_id, amount) VALUES (?, ?)", (self.current_user_id, 0.0))
-            self.cursor.execute("INSERT OR IGNORE INTO goals (user_id, target) VALUES (?, ?)", (self.current_user_id, 0.0))
-            # ensure default family member exists
-            self.cursor.execute("SELECT id FROM family_members WHERE owner_id=? LIMIT 1", (self.current_user_id,))
-            if self.cursor.fetchone() is None:
-                self.cursor.execute(
-                    "INSERT INTO family_members (owner_id, name, role, color, avatar) VALUES (?, ?, ?, ?, ?)",
-                    (self.current_user_id, "Я", "Владелец", "#6C5CE7", "")
-                )
-            self.conn.commit()
+            with self.transaction() as conn:
+                # ensure balance and goals
+                conn.execute("INSERT OR IGNORE INTO balance (user_id, amount) VALUES (?, ?)", (self.current_user_id, 0.0))
+                conn.execute("INSERT OR IGNORE INTO goals (user_id, target) VALUES (?, ?)", (self.current_user_id, 0.0))
+                # ensure default family member exists
+                if conn.execute("SELECT id FROM family_members WHERE owner_id=? LIMIT 1", (self.current_user_id,)).fetchone() is None:
+                    conn.execute(
+                        "INSERT INTO family_members (owner_id, name, role, color, avatar) VALUES (?, ?, ?, ?, ?)",
+                        (self.current_user_id, "Я", "Владелец", "#6C5CE7", "")
+                    )
+            self._invalidate_members(self.current_user_id)
+            self._publish(db_events.USER_CHANGED)
             return True
         return False
 
     def logout(self):
         self.current_user_id = None
+        self._publish(db_events.USER_CHANGED)
 
     # ---------- проверка ----------
     def check_user(self):
@@ -151,15 +602,24 @@ class Database:
     def get_balance(self) -> float:
         if self.current_user_id is None:
             return 0.0
-        self.cursor.execute("SELECT amount FROM balance WHERE user_id=?", (self.current_user_id,))
-        r = self.cursor.fetchone()
+        cur = self._execute("SELECT amount FROM balance WHERE user_id=?", (self.current_user_id,))
+        r = cur.fetchone()
         return float(r[0]) if r and r[0] is not None else 0.0
 
     def update_balance(self, new_balance: float):
         if self.current_user_id is None:
             return
-        self.cursor.execute("UPDATE balance SET amount=? WHERE user_id=?", (float(new_balance), self.current_user_id))
-        self.conn.commit()
+        with self.transaction() as conn:
+            conn.execute("UPDATE balance SET amount=? WHERE user_id=?", (float(new_balance), self.current_user_id))
+            self._publish(db_events.BALANCE_CHANGED)
+
+    def adjust_balance(self, delta: float):
+        """Изменяет баланс на delta одним UPDATE — без чтения, параллельные изменения не теряются."""
+        if self.current_user_id is None:
+            return
+        with self.transaction() as conn:
+            conn.execute("UPDATE balance SET amount = amount + ? WHERE user_id=?", (float(delta), self.current_user_id))
+            self._publish(db_events.BALANCE_CHANGED)
 
     # ---------- история ----------
     def add_history(self, ttype: str, amount: float, category: str = "Прочее",
@@ -172,39 +632,200 @@ class Database:
         if self.current_user_id is None:
             return
         if date is None:
-            date = datetime.now().strftime("%d.%m.%Y %H:%M")
-        self.cursor.execute(
-            "INSERT INTO history (user_id, member_id, type, amount, category, description, date) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (self.current_user_id, member_id, ttype, float(amount), category, description, date)
-        )
-        self.conn.commit()
+            date = datetime.now().strftime(DATE_FORMAT)
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO history (user_id, member_id, type, amount, category, description, date, ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.current_user_id, member_id, ttype, float(amount), category, description, date, date_to_ts(date))
+            )
+            self._publish(db_events.HISTORY_ADDED)
+
+    def add_history_many(self, rows: Iterable[Sequence[Any]]) -> int:
+        """
+        Пакетная вставка в history одной транзакцией (executemany, один commit).
+        rows — кортежи в формате get_history: (type, amount, category, description, date, member),
+        где member — id участника, его имя или None ("Я"); date=None — текущее время.
+        Имя, которое носят несколько участников, не разрешается (ValueError): к кому отнести запись, неизвестно.
+        Проверка и разрешение имён участников выполняются один раз на пакет;
+        при любой ошибке пакет откатывается целиком (ValueError для некорректных строк).
+        Доходы без участника ("Я") прибавляются к balance в той же транзакции, как в IncomeScreen.add_income.
+        Возвращает число вставленных записей.
+        """
+        if self.current_user_id is None:
+            return 0
+        idx = self._members_index(self.current_user_id)
+        by_name = {name: m["id"] for name, m in idx["by_name"].items()}
+        names = [m["name"] for m in idx["list"]]
+        ambiguous = {name for name in names if names.count(name) > 1}
+        now = datetime.now().strftime(DATE_FORMAT)
+        params = []
+        balance_delta = 0.0
+        for n, row in enumerate(rows, 1):
+            try:
+                ttype, amount, category, description, date, member = row
+                amount = float(amount)
+            except (TypeError, ValueError):
+                raise ValueError(f"Строка {n}: неверный формат записи")
+            if ttype not in ("income", "expense"):
+                raise ValueError(f"Строка {n}: неизвестный тип операции {ttype!r}")
+            if member is None or member == "Я":
+                member_id = None
+            elif isinstance(member, int):
+                if member not in idx["by_id"]:
+                    raise ValueError(f"Строка {n}: участник с id={member} не найден")
+                member_id = member
+            elif member in ambiguous:
+                raise ValueError(f"Строка {n}: участников с именем {member!r} несколько — переименуйте их")
+            elif member in by_name:
+                member_id = by_name[member]
+            else:
+                raise ValueError(f"Строка {n}: участник {member!r} не найден")
+            date = date or now
+            params.append((self.current_user_id, member_id, ttype, amount, category or "Прочее",
+                           description or "", date, date_to_ts(date)))
+            if ttype == "income" and member_id is None:
+                balance_delta += amount
+        if not params:
+            return 0
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO history (user_id, member_id, type, amount, category, description, date, ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                params
+            )
+            self._publish(db_events.HISTORY_ADDED)
+            if balance_delta:
+                conn.execute("UPDATE balance SET amount = amount + ? WHERE user_id=?", (balance_delta, self.current_user_id))
+                self._publish(db_events.BALANCE_CHANGED)
+        return len(params)
 
-    def get_history(self) -> List[Tuple[Any, ...]]:
+    def get_history(self, ttype: Optional[str] = None) -> List[Tuple[Any, ...]]:
         """
         Возвращает все записи history для текущего пользователя в формате:
           (type, amount, category, description, date, member_id)
+        ttype ("income" / "expense") ограничивает выборку одним типом.
         """
         if self.current_user_id is None:
             return []
-        self.cursor.execute(
-            "SELECT type, amount, category, description, date, member_id FROM history WHERE user_id=? ORDER BY id DESC",
+        where, params = self._history_filter(ttype)
+        cur = self._execute(
+            f"SELECT type, amount, category, description, date, member_id FROM history WHERE {where} ORDER BY id DESC",
+            params
+        )
+        return cur.fetchall()
+
+    def iter_history(self, chunk_size: int = 1000, ttype: Optional[str] = None) -> Iterator[Tuple[Any, ...]]:
+        """
+        Потоковое чтение history текущего пользователя (от старых записей к новым),
+        в том же формате, что get_history. Строки читаются порциями через fetchmany,
+        в памяти держится не больше chunk_size записей.
+        """
+        if self.current_user_id is None:
+            return
+        where, params = self._history_filter(ttype)
+        cur = self._execute(
+            f"SELECT type, amount, category, description, date, member_id FROM history WHERE {where} ORDER BY id",
+            params
+        )
+        try:
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cur.close()
+
+    def iter_history_columns(self, chunk_size: int = 10000) -> Iterator[List[Tuple[Any, ...]]]:
+        """
+        Порции history текущего пользователя для колоночной обработки (см. columnar.py):
+          [(id, type, ts, amount, category, member_id), ...]
+        category уже приведена ("Прочее" вместо пустой), ts может быть None.
+        """
+        if self.current_user_id is None:
+            return
+        cur = self._execute(
+            "SELECT id, type, ts, amount, COALESCE(NULLIF(category, ''), 'Прочее'), member_id "
+            "FROM history WHERE user_id=? ORDER BY id",
             (self.current_user_id,)
         )
-        return self.cursor.fetchall()
+        try:
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cur.close()
+
+    def get_history_page(self, before_id: Optional[int] = None, limit: int = 50,
+                         filters: Optional[Dict[str, Any]] = None) -> List[Tuple[Any, ...]]:
+        """
+        Страница history (keyset-пагинация по id, от новых к старым):
+          (id, type, amount, category, description, date, member_id)
+        before_id — id последней записи предыдущей страницы (None — первая страница).
+        filters — необязательный словарь с ключами type, member_ids, date_from, date_to
+        (значения как в get_category_totals).
+        """
+        if self.current_user_id is None:
+            return []
+        f = filters or {}
+        where, params = self._history_filter(f.get("type"), f.get("member_ids"), f.get("date_from"), f.get("date_to"))
+        if before_id is not None:
+            where += " AND id < ?"
+            params.append(int(before_id))
+        params.append(int(limit))
+        cur = self._execute(
+            f"SELECT id, type, amount, category, description, date, member_id FROM history WHERE {where} "
+            "ORDER BY id DESC LIMIT ?",
+            params
+        )
+        return cur.fetchall()
+
+    def get_history_stats(self) -> Tuple[int, int]:
+        """
+        (max_id, changes) для текущего пользователя: наибольший id в history и счётчик
+        изменений и удалений его записей (history_changes). Пока changes прежний,
+        записи с id <= max_id не менялись — могли только добавиться новые.
+        """
+        if self.current_user_id is None:
+            return 0, 0
+        max_id = self._execute("SELECT IFNULL(MAX(id), 0) FROM history WHERE user_id=?",
+                               (self.current_user_id,)).fetchone()[0]
+        row = self._execute("SELECT changes FROM history_changes WHERE user_id=?",
+                            (self.current_user_id,)).fetchone()
+        return int(max_id), int(row[0]) if row else 0
+
+    def get_totals_after(self, after_id: int, ttype: str, member_ids: Optional[List[Optional[int]]] = None,
+                         date_from: Optional[int] = None, date_to: Optional[int] = None) -> List[Tuple[str, Optional[str], float]]:
+        """
+        Суммы записей с id > after_id: [(category, day, total), ...]
+        (фильтры как у get_category_totals; day = None для записей без ts).
+        """
+        if self.current_user_id is None:
+            return []
+        where, params = self._history_filter(ttype, member_ids, date_from, date_to)
+        params.append(int(after_id))
+        cur = self._execute(
+            f"SELECT COALESCE(NULLIF(category, ''), 'Прочее'), date(ts, 'unixepoch'), SUM(amount) FROM history "
+            f"WHERE {where} AND id > ? GROUP BY 1, 2",
+            params
+        )
+        return [(r[0], r[1], float(r[2])) for r in cur.fetchall()]
 
     # ---------- цели ----------
     def get_goal(self) -> float:
         if self.current_user_id is None:
             return 0.0
-        self.cursor.execute("SELECT target FROM goals WHERE user_id=?", (self.current_user_id,))
-        r = self.cursor.fetchone()
+        cur = self._execute("SELECT target FROM goals WHERE user_id=?", (self.current_user_id,))
+        r = cur.fetchone()
         return float(r[0]) if r and r[0] is not None else 0.0
 
     def set_goal(self, new_goal: float):
         if self.current_user_id is None:
             return
-        self.cursor.execute("UPDATE goals SET target=? WHERE user_id=?", (float(new_goal), self.current_user_id))
-        self.conn.commit()
+        with self.transaction() as conn:
+            conn.execute("UPDATE goals SET target=? WHERE user_id=?", (float(new_goal), self.current_user_id))
+            self._publish(db_events.GOAL_CHANGED)
 
     # ---------- family members ----------
     def get_family_members(self, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
@@ -216,9 +837,34 @@ class Database:
         uid = user_id if user_id is not None else self.current_user_id
         if uid is None:
             return []
-        self.cursor.execute("SELECT id, name, role, color, avatar FROM family_members WHERE owner_id=? ORDER BY id", (uid,))
-        rows = self.cursor.fetchall()
-        return [{"id": r[0], "name": r[1], "role": r[2], "color": r[3], "avatar": r[4]} for r in rows]
+        # копии словарей, чтобы вызывающий код не мог испортить кэш
+        return [dict(m) for m in self._members_index(uid)["list"]]
+
+    def _members_index(self, owner_id: int) -> Dict[str, Any]:
+        """Члены семьи owner_id из кэша (при промахе — один SELECT), с индексами по id и по имени."""
+        cached = self._members_cache.get(owner_id)
+        if cached is None:
+            gen = self._members_gen
+            rows = self._execute("SELECT id, name, role, color, avatar FROM family_members WHERE owner_id=? ORDER BY id", (owner_id,)).fetchall()
+            members = [{"id": r[0], "name": r[1], "role": r[2], "color": r[3], "avatar": r[4]} for r in rows]
+            by_name: Dict[str, Dict[str, Any]] = {}
+            for m in members:
+                by_name.setdefault(m["name"], m)
+            # "other" — имена id, которых нет среди участников владельца (удалённые и т.п.)
+            cached = {"list": members, "by_id": {m["id"]: m for m in members}, "by_name": by_name, "other": {}}
+            with self._cache_lock:
+                # пока читали, другой поток мог изменить состав семьи — тогда не кэшируем
+                if gen == self._members_gen:
+                    self._members_cache[owner_id] = cached
+        return cached
+
+    def _invalidate_members(self, owner_id: Optional[int] = None):
+        with self._cache_lock:
+            self._members_gen += 1
+            if owner_id is None:
+                self._members_cache.clear()
+            else:
+                self._members_cache.pop(owner_id, None)
 
     def add_family_member(self, name: str, role: str = "", color: str = "#6C5CE7", avatar: str = "") -> Optional[int]:
         """
@@ -228,16 +874,18 @@ class Database:
         """
         if self.current_user_id is None:
             return None
-        self.cursor.execute("SELECT COUNT(*) FROM family_members WHERE owner_id=?", (self.current_user_id,))
-        count = self.cursor.fetchone()[0]
-        if count >= 5:
-            return None
-        self.cursor.execute(
-            "INSERT INTO family_members (owner_id, name, role, color, avatar) VALUES (?, ?, ?, ?, ?)",
-            (self.current_user_id, name, role, color, avatar)
-        )
-        self.conn.commit()
-        return self.cursor.lastrowid
+        with self.transaction() as conn:
+            # проверка лимита и вставка в одной транзакции писателя
+            count = conn.execute("SELECT COUNT(*) FROM family_members WHERE owner_id=?", (self.current_user_id,)).fetchone()[0]
+            if count >= 5:
+                return None
+            new_id = conn.execute(
+                "INSERT INTO family_members (owner_id, name, role, color, avatar) VALUES (?, ?, ?, ?, ?)",
+                (self.current_user_id, name, role, color, avatar)
+            ).lastrowid
+            self._publish(db_events.MEMBER_ADDED)
+        self._invalidate_members(self.current_user_id)
+        return new_id
 
     def remove_family_member(self, member_id: int):
         """
@@ -246,51 +894,188 @@ class Database:
         """
         if self.current_user_id is None:
             return
-        self.cursor.execute("SELECT owner_id FROM family_members WHERE id=?", (member_id,))
-        r = self.cursor.fetchone()
-        if not r or r[0] != self.current_user_id:
-            return
-        self.cursor.execute("DELETE FROM family_members WHERE id=?", (member_id,))
-        self.conn.commit()
+        with self.transaction() as conn:
+            r = conn.execute("SELECT owner_id FROM family_members WHERE id=?", (member_id,)).fetchone()
+            if not r or r[0] != self.current_user_id:
+                return
+            conn.execute("DELETE FROM family_members WHERE id=?", (member_id,))
+            self._publish(db_events.MEMBER_REMOVED)
+        self._invalidate_members(self.current_user_id)
 
     def get_member_name(self, member_id: Optional[int]) -> str:
         if member_id is None:
             return "Я"
-        self.cursor.execute("SELECT name FROM family_members WHERE id=?", (member_id,))
-        r = self.cursor.fetchone()
-        return r[0] if r else "Неизвестно"
+        idx = self._members_index(self.current_user_id) if self.current_user_id is not None else None
+        if idx is not None:
+            m = idx["by_id"].get(member_id)
+            if m is not None:
+                return m["name"]
+            if member_id in idx["other"]:
+                return idx["other"][member_id]
+        # участник другого владельца или уже удалённый — спрашиваем базу один раз
+        cur = self._execute("SELECT name FROM family_members WHERE id=?", (member_id,))
+        r = cur.fetchone()
+        name = r[0] if r else "Неизвестно"
+        if idx is not None:
+            idx["other"][member_id] = name
+        return name
+
+    def get_member_id(self, name: str) -> Optional[int]:
+        """id участника по имени (из кэша). Для "Я" и неизвестных имён — None."""
+        if name == "Я" or self.current_user_id is None:
+            return None
+        m = self._members_index(self.current_user_id)["by_name"].get(name)
+        return m["id"] if m else None
+
+    def get_member_ids(self, name: str) -> List[Optional[int]]:
+        """
+        Возвращает id участников с указанным именем.
+        Для "Я" добавляется None — записи history без member_id тоже относятся к владельцу.
+        """
+        ids: List[Optional[int]] = [m["id"] for m in self.get_family_members() if m["name"] == name]
+        if name == "Я":
+            ids.insert(0, None)
+        return ids
 
     def get_member_summary(self, member_id: Optional[int]) -> Dict[str, float]:
         """Возвращает суммарные доходы, расходы и баланс для конкретного member_id (или для 'Я' при None)."""
         if self.current_user_id is None:
             return {"income": 0.0, "expense": 0.0, "balance": 0.0}
-        if member_id is None:
-            # NULL member_id => 'Я'
-            self.cursor.execute("SELECT IFNULL(SUM(amount),0) FROM history WHERE user_id=? AND type='income' AND member_id IS NULL", (self.current_user_id,))
-            inc = self.cursor.fetchone()[0] or 0.0
-            self.cursor.execute("SELECT IFNULL(SUM(amount),0) FROM history WHERE user_id=? AND type='expense' AND member_id IS NULL", (self.current_user_id,))
-            exp = self.cursor.fetchone()[0] or 0.0
-        else:
-            self.cursor.execute("SELECT IFNULL(SUM(amount),0) FROM history WHERE user_id=? AND type='income' AND member_id=?", (self.current_user_id, member_id))
-            inc = self.cursor.fetchone()[0] or 0.0
-            self.cursor.execute("SELECT IFNULL(SUM(amount),0) FROM history WHERE user_id=? AND type='expense' AND member_id=?", (self.current_user_id, member_id))
-            exp = self.cursor.fetchone()[0] or 0.0
-        return {"income": float(inc), "expense": float(exp), "balance": float(inc) - float(exp)}
+        # одна строка member_balance по первичному ключу (NULL member_id => 0 => 'Я')
+        r = self._execute(
+            "SELECT income, expense FROM member_balance WHERE user_id=? AND member_id=?",
+            (self.current_user_id, 0 if member_id is None else member_id)
+        ).fetchone()
+        inc, exp = (float(r[0]), float(r[1])) if r else (0.0, 0.0)
+        return {"income": inc, "expense": exp, "balance": inc - exp}
 
     def get_all_members_with_summary(self) -> List[Dict[str, Any]]:
-        members = self.get_family_members()
+        """
+        Члены семьи с доходами/расходами/балансом за один запрос:
+        суммы берутся из member_balance (ведётся триггерами) и присоединяются к family_members,
+        отдельной строкой (id=NULL) идут записи без участника — это 'Я'.
+        """
+        cur = self._execute("""
+            SELECT f.id, f.name, f.role, f.color, IFNULL(b.income, 0), IFNULL(b.expense, 0)
+            FROM family_members f LEFT JOIN member_balance b ON b.user_id = f.owner_id AND b.member_id = f.id
+            WHERE f.owner_id=?
+            UNION ALL
+            SELECT NULL, 'Я', 'Владелец', '#6C5CE7', b.income, b.expense
+            FROM member_balance b WHERE b.user_id=? AND b.member_id = 0
+            ORDER BY 1
+        """, (self.current_user_id, self.current_user_id))
         res = []
-        for m in members:
-            s = self.get_member_summary(m["id"])
-            row = {"id": m["id"], "name": m["name"], "role": m["role"], "color": m["color"], **s}
-            res.append(row)
+        me = None
+        for mid, name, role, color, inc, exp in cur.fetchall():
+            row = {"id": mid, "name": name, "role": role, "color": color,
+                   "income": float(inc), "expense": float(exp), "balance": float(inc) - float(exp)}
+            if mid is None:
+                me = row
+            else:
+                res.append(row)
         # include 'Я' aggregate if missing
-        has_me = any(m["name"] == "Я" for m in members)
+        has_me = any(m["name"] == "Я" for m in res)
         if not has_me:
-            s = self.get_member_summary(None)
-            res.insert(0, {"id": None, "name": "Я", "role": "Владелец", "color": "#6C5CE7", **s})
+            if me is None:
+                me = {"id": None, "name": "Я", "role": "Владелец", "color": "#6C5CE7",
+                      "income": 0.0, "expense": 0.0, "balance": 0.0}
+            res.insert(0, me)
         return res
 
+    # ---------- аналитика (агрегация на стороне SQL) ----------
+    def _history_filter(self, ttype: Optional[str] = None, member_ids: Optional[List[Optional[int]]] = None,
+                        date_from: Optional[int] = None, date_to: Optional[int] = None) -> Tuple[str, List[Any]]:
+        """
+        Собирает условие WHERE для выборок из history текущего пользователя.
+        member_ids=None — все участники; None внутри списка означает записи без member_id.
+        date_from / date_to — метки ts (см. date_to_ts), диапазон [date_from, date_to).
+        """
+        where = ["user_id=?"]
+        params: List[Any] = [self.current_user_id]
+        if ttype is not None:
+            where.append("type=?")
+            params.append(ttype)
+        if member_ids is not None:
+            ids = [m for m in member_ids if m is not None]
+            cond = []
+            if None in member_ids:
+                cond.append("member_id IS NULL")
+            if ids:
+                cond.append(f"member_id IN ({','.join('?' * len(ids))})")
+                params.extend(ids)
+            where.append("(" + " OR ".join(cond) + ")" if cond else "0")
+        if date_from is not None:
+            where.append("ts >= ?")
+            params.append(int(date_from))
+        if date_to is not None:
+            where.append("ts < ?")
+            params.append(int(date_to))
+        return " AND ".join(where), params
+
+    def _rollup_filter(self, ttype: str, member_ids: Optional[List[Optional[int]]] = None,
+                       date_from: Optional[int] = None, date_to: Optional[int] = None) -> Optional[Tuple[str, List[Any]]]:
+        """
+        Условие WHERE для daily_rollup (аргументы как у _history_filter).
+        Возвращает None, если границы диапазона не совпадают с началом суток —
+        тогда дневные суммы не подходят и считать нужно по history.
+        """
+        if any(t is not None and int(t) % 86400 for t in (date_from, date_to)):
+            return None
+        where = ["user_id=?", "type=?"]
+        params: List[Any] = [self.current_user_id, ttype]
+        if member_ids is not None:
+            ids = sorted({0 if m is None else m for m in member_ids})
+            where.append(f"member_id IN ({','.join('?' * len(ids))})" if ids else "0")
+            params.extend(ids)
+        if date_from is not None or date_to is not None:
+            where.append("day <> ''")
+        if date_from is not None:
+            where.append("day >= date(?, 'unixepoch')")
+            params.append(int(date_from))
+        if date_to is not None:
+            where.append("day < date(?, 'unixepoch')")
+            params.append(int(date_to))
+        return " AND ".join(where), params
+
+    def get_category_totals(self, ttype: str, member_ids: Optional[List[Optional[int]]] = None,
+                            date_from: Optional[int] = None, date_to: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Суммы по категориям: [(category, total), ...] по убыванию суммы.
+        Пустая категория считается как "Прочее".
+        Читает daily_rollup: стоимость зависит от числа дней и категорий, а не операций.
+        """
+        if self.current_user_id is None:
+            return []
+        flt = self._rollup_filter(ttype, member_ids, date_from, date_to)
+        if flt is not None:
+            where, params = flt
+            sql = f"SELECT category, SUM(total) FROM daily_rollup WHERE {where} GROUP BY category ORDER BY 2 DESC"
+        else:
+            where, params = self._history_filter(ttype, member_ids, date_from, date_to)
+            sql = (f"SELECT COALESCE(NULLIF(category, ''), 'Прочее') AS cat, SUM(amount) FROM history WHERE {where} "
+                   "GROUP BY cat ORDER BY 2 DESC")
+        cur = self._execute(sql, params)
+        return [(r[0], float(r[1])) for r in cur.fetchall()]
+
+    def get_daily_totals(self, ttype: str, member_ids: Optional[List[Optional[int]]] = None,
+                         date_from: Optional[int] = None, date_to: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Суммы по дням: [("YYYY-MM-DD", total), ...] по возрастанию даты.
+        Записи с неразобранной датой (ts IS NULL) не учитываются.
+        """
+        if self.current_user_id is None:
+            return []
+        flt = self._rollup_filter(ttype, member_ids, date_from, date_to)
+        if flt is not None:
+            where, params = flt
+            sql = f"SELECT day, SUM(total) FROM daily_rollup WHERE {where} AND day <> '' GROUP BY day ORDER BY day"
+        else:
+            where, params = self._history_filter(ttype, member_ids, date_from, date_to)
+            sql = (f"SELECT date(ts, 'unixepoch') AS day, SUM(amount) FROM history WHERE {where} AND ts IS NOT NULL "
+                   "GROUP BY day ORDER BY day")
+        cur = self._execute(sql, params)
+        return [(r[0], float(r[1])) for r in cur.fetchall()]
+
     # ---------- категории ----------
     def get_all_categories(self) -> List[str]:
         return [
@@ -298,13 +1083,58 @@ class Database:
             "Здоровье", "Образование", "Подарки", "Одежда", "Прочее"
         ]
 
+    # ---------- обслуживание ----------
+    def integrity_check(self) -> List[str]:
+        """PRAGMA integrity_check и foreign_key_check: пустой список — ошибок нет."""
+        self.flush()
+        conn = self.conn
+        problems = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall() if r[0] != "ok"]
+        for table, rowid, parent, _ in conn.execute("PRAGMA foreign_key_check").fetchall():
+            problems.append(f"{table} rowid={rowid}: нет строки в {parent}")
+        return problems
+
+    def rebuild_aggregates(self):
+        """Пересчитывает member_balance и daily_rollup по history (если их правили в обход триггеров)."""
+        with self.transaction() as conn:
+            self._fill_member_balance(conn)
+            self._fill_daily_rollup(conn)
+            # агрегаты пересчитаны для всех — кэши аналитики (и в других процессах) пересчитают всё заново
+            conn.execute("""
+                INSERT INTO history_changes (user_id, changes) SELECT id, 1 FROM users WHERE 1
+                ON CONFLICT (user_id) DO UPDATE SET changes = changes + 1
+            """)
+        self._invalidate_members(None)
+
+    def optimize(self):
+        """Обновляет статистику планировщика (PRAGMA optimize) и переносит WAL в основной файл."""
+        self.flush()
+        with self._write_lock:
+            conn = self.conn
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def vacuum(self):
+        """Пересобирает файл базы, возвращая место после удалений (долго на больших базах)."""
+        self.flush()
+        with self._write_lock:
+            self.conn.execute("VACUUM")
+
     # ---------- close ----------
     def close(self):
+        """Фиксирует отложенные транзакции и закрывает соединения всех потоков."""
         try:
-            self.conn.commit()
-        except Exception:
-            pass
-        try:
-            self.conn.close()
+            self.flush()
         except Exception:
             pass
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            try:
+                conn.commit()
+            except Exception:
+                pass
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
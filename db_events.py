@@ -0,0 +1,40 @@
+# db_events.py
+"""
+События изменений данных, которые публикует Database (см. Database.subscribe).
+
+Подписчик — функция callback(event, user_id). События записи приходят после
+фиксации транзакции (из того потока, который писал); при откате не приходят.
+"""
+from typing import Iterable, Optional
+
+HISTORY_ADDED = "history_added"
+MEMBER_ADDED = "member_added"
+MEMBER_REMOVED = "member_removed"
+BALANCE_CHANGED = "balance_changed"
+GOAL_CHANGED = "goal_changed"
+# вход или выход: у всех экранов меняется набор данных
+USER_CHANGED = "user_changed"
+
+ALL_EVENTS = frozenset({HISTORY_ADDED, MEMBER_ADDED, MEMBER_REMOVED, BALANCE_CHANGED, GOAL_CHANGED, USER_CHANGED})
+MEMBER_EVENTS = frozenset({MEMBER_ADDED, MEMBER_REMOVED})
+
+
+class DirtyFlag:
+    """
+    Флаг «данные экрана устарели»: поднимается событиями из events, сбрасывается consume().
+    Изначально поднят — первый показ экрана всегда загружает данные.
+    """
+
+    def __init__(self, db, events: Iterable[str] = ALL_EVENTS):
+        self.events = frozenset(events) | {USER_CHANGED}
+        self.dirty = True
+        db.subscribe(self._on_event)
+
+    def _on_event(self, event: str, user_id: Optional[int]):
+        if event in self.events:
+            self.dirty = True
+
+    def consume(self) -> bool:
+        """True, если с прошлого вызова были изменения (и флаг сбрасывается)."""
+        dirty, self.dirty = self.dirty, False
+        return dirty
@@ -0,0 +1,55 @@
+# db_worker.py
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Union
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+
+class AsyncDatabase:
+    """
+    Асинхронный фасад над Database: запросы выполняются в фоновом потоке,
+    а результат возвращается как concurrent.futures.Future и, если передан callback,
+    доставляется в главный поток Kivy через Clock.schedule_once.
+
+    По умолчанию поток один — фоновые запросы выполняются строго по очереди.
+    """
+
+    def __init__(self, db, workers: int = 1):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db-worker")
+
+    def submit(self, method: Union[str, Callable[..., Any]], *args,
+               callback: Optional[Callable[[Any], None]] = None,
+               errback: Optional[Callable[[BaseException], None]] = None, **kwargs) -> Future:
+        """
+        Ставит вызов в очередь.
+        method — имя метода Database ("get_history_page") или произвольная функция;
+        функции первым аргументом получают сам Database, чтобы несколько запросов
+        можно было выполнить одной задачей.
+        callback(result) / errback(exc) вызываются в главном потоке.
+        """
+        if isinstance(method, str):
+            fn = getattr(self.db, method)
+        else:
+            fn = method
+            args = (self.db,) + args
+        fut = self._executor.submit(fn, *args, **kwargs)
+        if callback is not None or errback is not None:
+            fut.add_done_callback(lambda f: Clock.schedule_once(lambda dt: self._deliver(f, callback, errback)))
+        return fut
+
+    def _deliver(self, fut: Future, callback, errback):
+        exc = fut.exception()
+        if exc is not None:
+            if errback is not None:
+                errback(exc)
+            else:
+                # без errback ошибка не должна теряться молча
+                Logger.exception("AsyncDatabase: ошибка фонового запроса", exc_info=exc)
+            return
+        if callback is not None:
+            callback(fut.result())
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
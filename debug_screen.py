@@ -0,0 +1,85 @@
+# debug_screen.py
+import os
+from datetime import datetime
+
+from kivy.uix.screenmanager import Screen
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.label import Label
+from kivy.uix.button import Button
+from kivy.uix.scrollview import ScrollView
+from kivy.graphics import Color, Rectangle
+from kivy.metrics import dp
+from kivy.app import App
+from profiling import SCREEN_STATS, dump_json, report
+
+TOP_SQL = 25
+
+
+class DebugScreen(Screen):
+    """
+    Скрытый экран статистики (открывается по F12): время методов экранов
+    и запросов к базе — число вызовов, сумма, p95, максимум.
+    """
+
+    def __init__(self, db=None, **kwargs):
+        super().__init__(**kwargs)
+        self.db = db
+        self.previous = "main"
+        with self.canvas.before:
+            Color(0.08, 0.08, 0.10, 1)
+            self.rect = Rectangle(size=self.size, pos=self.pos)
+        self.bind(size=self.update_rect, pos=self.update_rect)
+
+        root = BoxLayout(orientation="vertical", padding=dp(12), spacing=dp(8))
+        self.lbl = Label(text="", size_hint_y=None, halign="left", valign="top", font_size=12)
+        self.lbl.bind(width=lambda *a: setattr(self.lbl, "text_size", (self.lbl.width, None)),
+                      texture_size=lambda *a: setattr(self.lbl, "height", self.lbl.texture_size[1]))
+        scroll = ScrollView()
+        scroll.add_widget(self.lbl)
+        root.add_widget(scroll)
+
+        btns = BoxLayout(size_hint_y=None, height=dp(48), spacing=dp(8))
+        for text, handler in (("Обновить", self.refresh), ("Сбросить", self.reset),
+                              ("Сохранить JSON", self.save), ("Назад", self.go_back)):
+            btn = Button(text=text, background_normal="", background_color=(0.25, 0.25, 0.25, 1))
+            btn.bind(on_press=lambda inst, h=handler: h())
+            btns.add_widget(btn)
+        root.add_widget(btns)
+        self.add_widget(root)
+
+    def update_rect(self, *args):
+        self.rect.pos = self.pos
+        self.rect.size = self.size
+
+    def _db(self):
+        return self.db or App.get_running_app().db
+
+    @staticmethod
+    def _table(title, rows, limit=None):
+        lines = [f"[ {title} ]", f"{'count':>7} {'total ms':>10} {'p95 ms':>8} {'max ms':>8}  name"]
+        for r in rows[:limit]:
+            lines.append(f"{r['count']:>7} {r['total_ms']:>10.1f} {r['p95_ms']:>8.2f} {r['max_ms']:>8.2f}  {r['name'][:120]}")
+        if not rows:
+            lines.append("  нет данных")
+        return "\n".join(lines)
+
+    def refresh(self):
+        data = report(self._db())
+        self.lbl.text = self._table("Экраны", data["screens"]) + "\n\n" + self._table("SQL", data["sql"], TOP_SQL)
+
+    def reset(self):
+        SCREEN_STATS.reset()
+        self._db().stats.reset()
+        self.refresh()
+
+    def save(self):
+        path = os.path.join(App.get_running_app().user_data_dir, f"stats_{datetime.now():%Y%m%d_%H%M%S}.json")
+        dump_json(path, self._db())
+        self.refresh()
+        self.lbl.text = f"Сохранено: {path}\n\n" + self.lbl.text
+
+    def go_back(self):
+        self.manager.current = self.previous
+
+    def on_pre_enter(self, *args):
+        self.refresh()
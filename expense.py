@@ -4,17 +4,20 @@ from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
 from kivy.uix.spinner import Spinner
-from kivy.uix.scrollview import ScrollView
 from kivy.uix.widget import Widget
 from kivy.app import App
 from kivy.graphics import Color, Rectangle, RoundedRectangle
 from kivy.animation import Animation
 from kivy.metrics import dp
+from history_view import HistoryListView
+from profiling import timed
+from db_events import BALANCE_CHANGED, HISTORY_ADDED, MEMBER_EVENTS, DirtyFlag
 
 class ExpenseScreen(Screen):
     def __init__(self, db=None, **kwargs):
         super().__init__(**kwargs)
         self.db = db
+        self._changes = None
         with self.canvas.before:
             Color(0.08,0.08,0.10,1)
             self.rect = Rectangle(size=self.size, pos=self.pos)
@@ -70,11 +73,9 @@ class ExpenseScreen(Screen):
 
         # История расходов
         root.add_widget(Label(text="[b]История расходов[/b]", markup=True, size_hint_y=None, height=dp(26)))
-        self.scroll = ScrollView()
-        self.box_list = BoxLayout(orientation="vertical", size_hint_y=None, spacing=dp(6))
-        self.box_list.bind(minimum_height=self.box_list.setter("height"))
-        self.scroll.add_widget(self.box_list)
-        root.add_widget(self.scroll)
+        # только расходы: фильтр по типу в SQL, строки подгружаются страницами
+        self.history_view = HistoryListView(db=self.db, filters={"type": "expense"})
+        root.add_widget(self.history_view)
 
         root.add_widget(Widget(size_hint_y=0.1))
         self.add_widget(root)
@@ -107,7 +108,7 @@ class ExpenseScreen(Screen):
 
     def on_member_select(self, spinner, text):
         db_loc = self.db or App.get_running_app().db
-        member_id = None if text == "Я" else next((m["id"] for m in db_loc.get_family_members() if m["name"] == text), None)
+        member_id = db_loc.get_member_id(text)
         summary = db_loc.get_member_summary(member_id)
         self.lbl_balance.text = f"₽ {summary['balance']:,.2f}"
 
@@ -122,7 +123,7 @@ class ExpenseScreen(Screen):
         description = self.input_description.text.strip()
         member_name = self.member_spinner.text
         db_loc = self.db or App.get_running_app().db
-        member_id = None if member_name == "Я" else next((m["id"] for m in db_loc.get_family_members() if m["name"] == member_name), None)
+        member_id = db_loc.get_member_id(member_name)
         db_loc.add_history("expense", amount, category, description, None, member_id)
         self.on_member_select(self.member_spinner, member_name)
         self.input_amount.text = ""
@@ -130,19 +131,17 @@ class ExpenseScreen(Screen):
         self.member_spinner.values = self._member_values()
         self.update_list()
 
+    @timed("expense.update_list")
     def update_list(self):
-        self.box_list.clear_widgets()
-        db_loc = self.db or App.get_running_app().db
-        history = db_loc.get_history()
-        expenses = [h for h in history if h[0] == "expense"]
-        for typ, amount, category, desc, date, member_id in expenses:
-            member_name = db_loc.get_member_name(member_id)
-            lbl = Label(text=f"{date} [{member_name}] [{category}] -{amount} ₽ ({desc})",
-                        size_hint_y=None, height=dp(28), halign="left", valign="middle", color=(1,0.3,0.3,1))
-            lbl.bind(size=lbl.setter("text_size"))
-            self.box_list.add_widget(lbl)
+        self.history_view.reload()
 
+    @timed("expense.on_pre_enter")
     def on_pre_enter(self, *args):
+        if self._changes is None:
+            self._changes = DirtyFlag(self.db or App.get_running_app().db,
+                                      MEMBER_EVENTS | {HISTORY_ADDED, BALANCE_CHANGED})
+        if not self._changes.consume():
+            return
         self.member_spinner.values = self._member_values()
         self.member_spinner.text = "Я"
         self.on_member_select(self.member_spinner, "Я")
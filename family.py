@@ -9,6 +9,7 @@ from kivy.uix.scrollview import ScrollView
 from kivy.metrics import dp
 from kivy.app import App
 from kivy.uix.widget import Widget
+from profiling import timed
 
 class FamilyScreen(Screen):
     def __init__(self, db=None, **kwargs):
@@ -49,6 +50,7 @@ class FamilyScreen(Screen):
         self.add_widget(root)
         self.refresh()
 
+    @timed("family.refresh")
     def refresh(self):
         self.grid.clear_widgets()
         db_loc = self.db or App.get_running_app().db
@@ -3,17 +3,20 @@ from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
-from kivy.uix.scrollview import ScrollView
 from kivy.uix.widget import Widget
-from kivy.app import App
 from kivy.graphics import Color, Rectangle
 from kivy.metrics import dp
+from kivy.app import App
 from kivy.animation import Animation
+from history_view import HistoryListView
+from profiling import timed
+from db_events import HISTORY_ADDED, MEMBER_EVENTS, DirtyFlag
 
 class HistoryScreen(Screen):
     def __init__(self, db=None, **kwargs):
         super().__init__(**kwargs)
         self.db = db
+        self._changes = None
         with self.canvas.before:
             Color(0.08,0.08,0.10,1)
             self.rect = Rectangle(size=self.size, pos=self.pos)
@@ -22,11 +25,9 @@ class HistoryScreen(Screen):
         root = BoxLayout(orientation="vertical", padding=dp(16), spacing=dp(10))
         root.add_widget(Label(text="[b]Вся история[/b]", markup=True, font_size=20, size_hint_y=None, height=dp(36)))
 
-        self.scroll = ScrollView()
-        self.box_list = BoxLayout(orientation="vertical", size_hint_y=None, spacing=dp(6))
-        self.box_list.bind(minimum_height=self.box_list.setter("height"))
-        self.scroll.add_widget(self.box_list)
-        root.add_widget(self.scroll)
+        # виртуализированный список: записи подгружаются страницами при прокрутке
+        self.history_view = HistoryListView(db=self.db)
+        root.add_widget(self.history_view)
 
         btn_back = Button(text="Назад", background_normal="", background_color=(0.25,0.25,0.25,1), size_hint_y=None, height=dp(48))
         btn_back.bind(on_press=lambda inst: self.animate_and_switch(inst, "main"))
@@ -46,17 +47,14 @@ class HistoryScreen(Screen):
         self.animate_button(instance)
         self.manager.current = screen_name
 
+    @timed("history.update_list")
     def update_list(self):
-        self.box_list.clear_widgets()
-        db_loc = self.db or App.get_running_app().db
-        history = db_loc.get_history()
-        for typ, amount, category, desc, date, member_id in history:
-            member_name = db_loc.get_member_name(member_id)
-            color = (0.2,1,0.6,1) if typ == "income" else (1,0.3,0.3,1)
-            lbl = Label(text=f"{date} [{member_name}] [{category}] {'+' if typ=='income' else '-'}{amount} ₽ ({desc})",
-                        size_hint_y=None, height=dp(28), halign="left", valign="middle", color=color, markup=False)
-            lbl.bind(size=lbl.setter("text_size"))
-            self.box_list.add_widget(lbl)
+        self.history_view.reload()
 
+    @timed("history.on_pre_enter")
     def on_pre_enter(self, *args):
-        self.update_list()
\ No newline at end of file
+        # список перечитывается, только если с прошлого показа появились записи или сменились члены семьи
+        if self._changes is None:
+            self._changes = DirtyFlag(self.db or App.get_running_app().db, MEMBER_EVENTS | {HISTORY_ADDED})
+        if self._changes.consume():
+            self.update_list()
\ No newline at end of file
@@ -0,0 +1,125 @@
+# history_io.py
+"""
+Потоковый импорт и экспорт истории операций текущего пользователя.
+
+Колонки: type, amount, category, description, date, member.
+member — имя участника ("Я" — сам пользователь), а не id: id свои в каждой базе,
+поэтому при импорте в другую базу или другой аккаунт имя сопоставляется с участником
+этого аккаунта (участника с таким именем нужно создать заранее, иначе пакет отклоняется).
+Имена участников не уникальны, а в файле другого различия нет: если в принимающем аккаунте
+имя носят несколько участников, пакет тоже отклоняется, а записи тёзок из исходной базы
+попадают к одному участнику. Перед переносом тёзок стоит переименовать.
+Файлы прежнего формата с колонкой member_id тоже читаются; числа в ней — id этой же базы.
+Экспорт читает базу порциями (fetchmany), импорт пишет пакетами через
+Database.add_history_many (каждый пакет — отдельная транзакция),
+в памяти не держится больше одной порции.
+JSON — в формате JSON Lines: один объект на строку.
+"""
+import csv
+import json
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+FIELDS = ("type", "amount", "category", "description", "date", "member")
+CHUNK_SIZE = 1000
+BATCH_SIZE = 5000
+
+
+def _batches(rows: Iterable[Tuple[Any, ...]], size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _parse_member(value: Any) -> Any:
+    """Участник из файла: пусто -> None, число -> id (старые файлы с member_id), иначе имя участника."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, int):
+        return value
+    value = str(value).strip()
+    return int(value) if value.isdigit() else value
+
+
+def _import_rows(db, rows: Iterable[Tuple[Any, ...]], batch_size: int) -> int:
+    total = 0
+    for batch in _batches(rows, batch_size):
+        total += db.add_history_many(batch)
+    return total
+
+
+def _member_field(rec: dict) -> Any:
+    """Участник записи: колонка member — всегда имя (и "42" тоже), старая member_id — через _parse_member."""
+    if "member" in rec:
+        name = "" if rec["member"] is None else str(rec["member"]).strip()
+        return name or None
+    return _parse_member(rec.get("member_id"))
+
+
+# ---------- экспорт ----------
+def _export_rows(db, chunk_size: int, ttype: Optional[str]) -> Iterator[Tuple[Any, ...]]:
+    # member_id -> имя участника (имена берутся из кэша участников Database)
+    for row in db.iter_history(chunk_size, ttype):
+        yield row[:5] + (db.get_member_name(row[5]),)
+
+
+def export_csv(db, fp: TextIO, chunk_size: int = CHUNK_SIZE, ttype: Optional[str] = None) -> int:
+    """Пишет историю в CSV (с заголовком). Возвращает число записей."""
+    writer = csv.writer(fp)
+    writer.writerow(FIELDS)
+    n = 0
+    for row in _export_rows(db, chunk_size, ttype):
+        writer.writerow(["" if v is None else v for v in row])
+        n += 1
+    return n
+
+
+def export_json(db, fp: TextIO, chunk_size: int = CHUNK_SIZE, ttype: Optional[str] = None) -> int:
+    """Пишет историю в JSON Lines. Возвращает число записей."""
+    n = 0
+    for row in _export_rows(db, chunk_size, ttype):
+        fp.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False))
+        fp.write("\n")
+        n += 1
+    return n
+
+
+# ---------- импорт ----------
+def iter_csv(fp: TextIO) -> Iterator[Tuple[Any, ...]]:
+    """Строки CSV (с заголовком FIELDS) в формате кортежей get_history."""
+    reader = csv.DictReader(fp)
+    missing = [f for f in ("type", "amount") if f not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"В CSV нет колонок: {', '.join(missing)}")
+    for rec in reader:
+        yield (rec["type"], rec["amount"], rec.get("category") or None, rec.get("description") or "",
+               rec.get("date") or None, _member_field(rec))
+
+
+def iter_json(fp: TextIO) -> Iterator[Tuple[Any, ...]]:
+    """Строки JSON Lines (объекты с ключами FIELDS или списки той же длины) в формате кортежей get_history."""
+    for n, line in enumerate(fp, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Строка {n}: некорректный JSON ({e.msg})")
+        if isinstance(rec, list):
+            rec = dict(zip(FIELDS, rec))
+        yield (rec.get("type"), rec.get("amount"), rec.get("category"), rec.get("description") or "",
+               rec.get("date"), _member_field(rec))
+
+
+def import_csv(db, fp: TextIO, batch_size: int = BATCH_SIZE) -> int:
+    """Загружает историю из CSV пакетами по batch_size. Возвращает число записей."""
+    return _import_rows(db, iter_csv(fp), batch_size)
+
+
+def import_json(db, fp: TextIO, batch_size: int = BATCH_SIZE) -> int:
+    """Загружает историю из JSON Lines пакетами по batch_size. Возвращает число записей."""
+    return _import_rows(db, iter_json(fp), batch_size)
@@ -0,0 +1,129 @@
+# history_view.py
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.label import Label
+from kivy.app import App
+from kivy.metrics import dp
+from kivy.logger import Logger
+from profiling import timed
+
+PAGE_SIZE = 50
+ROW_HEIGHT = dp(28)
+ROW_SPACING = dp(6)
+
+INCOME_COLOR = (0.2, 1, 0.6, 1)
+EXPENSE_COLOR = (1, 0.3, 0.3, 1)
+# последняя строка списка, если страница не загрузилась; при следующей подгрузке убирается
+ERROR_ROW = {"text": "Не удалось загрузить записи. Прокрутите, чтобы повторить", "color": (1, 0.8, 0.3, 1)}
+
+
+class HistoryRow(Label):
+    """Строка списка операций (viewclass для RecycleView, переиспользуется при прокрутке)."""
+
+    def __init__(self, **kwargs):
+        super().__init__(size_hint_y=None, height=ROW_HEIGHT, halign="left", valign="middle", markup=False, **kwargs)
+        self.bind(size=self.setter("text_size"))
+
+
+class HistoryListView(RecycleView):
+    """
+    Виртуализированный список операций.
+    Виджетов создаётся столько, сколько видно на экране; записи подгружаются
+    страницами через Database.get_history_page (в фоновом потоке App.db_async),
+    когда прокрутка подходит к концу.
+    filters передаются в get_history_page как есть (type, member_ids, date_from, date_to).
+    """
+
+    def __init__(self, db=None, filters=None, page_size=PAGE_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self.db = db
+        self.filters = filters or {}
+        self.page_size = page_size
+        self._last_id = None
+        self._exhausted = False
+        self._loading = False
+        self._generation = 0
+
+        self.viewclass = HistoryRow
+        self.layout = RecycleBoxLayout(orientation="vertical", size_hint_y=None, spacing=ROW_SPACING,
+                                       default_size=(None, ROW_HEIGHT), default_size_hint=(1, None))
+        self.layout.bind(minimum_height=self.layout.setter("height"))
+        self.add_widget(self.layout)
+        self.bind(scroll_y=self._on_scroll)
+
+    def _content_height(self, rows):
+        return max(0, rows * (ROW_HEIGHT + ROW_SPACING) - ROW_SPACING)
+
+    def format_row(self, db_loc, row):
+        hid, typ, amount, category, desc, date, member_id = row
+        member_name = db_loc.get_member_name(member_id)
+        sign = "+" if typ == "income" else "-"
+        return {
+            "text": f"{date} [{member_name}] [{category}] {sign}{amount} ₽ ({desc})",
+            "color": INCOME_COLOR if typ == "income" else EXPENSE_COLOR,
+        }
+
+    def reload(self):
+        """Сбрасывает список и загружает первую страницу."""
+        # новое поколение: ответы на запросы, отправленные до сброса, игнорируются
+        self._generation += 1
+        self._last_id = None
+        self._exhausted = False
+        self._loading = False
+        self.data = []
+        self.scroll_y = 1
+        self.load_more()
+
+    @timed("history_view.fetch_page")
+    def _fetch_page(self, app_db, before_id):
+        """Выполняется в фоновом потоке: страница из базы, уже в виде данных для строк."""
+        db_loc = self.db or app_db
+        rows = db_loc.get_history_page(before_id, self.page_size, self.filters)
+        return rows[-1][0] if rows else None, len(rows), [self.format_row(db_loc, r) for r in rows]
+
+    def load_more(self):
+        if self._exhausted or self._loading:
+            return
+        if self.data and self.data[-1] == ERROR_ROW:
+            self.data.pop()
+        self._loading = True
+        gen = self._generation
+        App.get_running_app().db_async.submit(self._fetch_page, self._last_id,
+                                              callback=lambda page: self._append_page(gen, page),
+                                              errback=lambda exc: self._page_failed(gen, exc))
+
+    def _page_failed(self, gen, exc):
+        Logger.exception("HistoryListView: не удалось загрузить страницу", exc_info=exc)
+        if gen != self._generation:
+            return
+        # без сброса _loading подгрузка остановилась бы навсегда
+        self._loading = False
+        self.data.append(dict(ERROR_ROW))
+
+    def _append_page(self, gen, page):
+        if gen != self._generation:
+            return
+        self._loading = False
+        last_id, count, items = page
+        if count < self.page_size:
+            self._exhausted = True
+        if not items:
+            return
+        self._last_id = last_id
+        # сохраняем положение прокрутки в пикселях от верха списка
+        old_h = self._content_height(len(self.data))
+        offset = (1 - self.scroll_y) * max(0, old_h - self.height)
+        self._loading = True
+        try:
+            self.data.extend(items)
+            new_h = self._content_height(len(self.data))
+            if new_h > self.height:
+                self.scroll_y = max(0, 1 - offset / (new_h - self.height))
+        finally:
+            self._loading = False
+
+    def _on_scroll(self, instance, value):
+        # scroll_y: 1 — верх, 0 — низ; догружаем, когда до конца осталось меньше экрана
+        hidden = self._content_height(len(self.data)) - self.height
+        if hidden <= 0 or value * hidden < self.height:
+            self.load_more()
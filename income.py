@@ -5,18 +5,21 @@ from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
 from kivy.uix.spinner import Spinner
-from kivy.uix.scrollview import ScrollView
 from kivy.uix.widget import Widget
 from kivy.app import App
 from kivy.graphics import Color, Rectangle, RoundedRectangle
 from kivy.animation import Animation
 from kivy.metrics import dp
+from history_view import HistoryListView
+from profiling import timed
+from db_events import BALANCE_CHANGED, HISTORY_ADDED, MEMBER_EVENTS, DirtyFlag
 
 
 class IncomeScreen(Screen):
     def __init__(self, db=None, **kwargs):
         super().__init__(**kwargs)
         self.db = db
+        self._changes = None
 
         with self.canvas.before:
             Color(0.08, 0.08, 0.10, 1)
@@ -81,11 +84,9 @@ class IncomeScreen(Screen):
 
         # --- История доходов ---
         root.add_widget(Label(text="[b]История доходов[/b]", markup=True, size_hint_y=None, height=dp(26)))
-        self.scroll = ScrollView()
-        self.box_list = BoxLayout(orientation="vertical", size_hint_y=None, spacing=dp(6))
-        self.box_list.bind(minimum_height=self.box_list.setter("height"))
-        self.scroll.add_widget(self.box_list)
-        root.add_widget(self.scroll)
+        # только доходы: фильтр по типу в SQL, строки подгружаются страницами
+        self.history_view = HistoryListView(db=self.db, filters={"type": "income"})
+        root.add_widget(self.history_view)
 
         root.add_widget(Widget(size_hint_y=0.1))
         self.add_widget(root)
@@ -120,9 +121,9 @@ class IncomeScreen(Screen):
             # баланс берём из таблицы balance (чтобы учитывать ручные корректировки)
             bal = db_loc.get_balance()
         else:
-            member = next((m for m in db_loc.get_family_members() if m["name"] == text), None)
-            if member:
-                s = db_loc.get_member_summary(member["id"])
+            member_id = db_loc.get_member_id(text)
+            if member_id is not None:
+                s = db_loc.get_member_summary(member_id)
                 bal = s.get("balance", 0.0)
             else:
                 bal = 0.0
@@ -141,19 +142,15 @@ class IncomeScreen(Screen):
         db_loc = self.db or App.get_running_app().db
 
         # определяем member_id (None = "Я")
-        if member_name == "Я":
-            member_id = None
-        else:
-            member = next((m for m in db_loc.get_family_members() if m["name"] == member_name), None)
-            member_id = member["id"] if member else None
+        member_id = db_loc.get_member_id(member_name)
 
-        # сохраняем в истории
-        db_loc.add_history("income", amount, category, description, None, member_id)
+        # запись в истории и баланс — одна транзакция (один commit)
+        with db_loc.transaction():
+            db_loc.add_history("income", amount, category, description, None, member_id)
 
-        # если доход относится к "Я", обновляем основную таблицу balance (как раньше)
-        if member_id is None:
-            new_balance = db_loc.get_balance() + amount
-            db_loc.update_balance(new_balance)
+            # если доход относится к "Я", обновляем основную таблицу balance (как раньше)
+            if member_id is None:
+                db_loc.adjust_balance(amount)
 
         # обновить отображение и список
         self.on_member_select(self.member_spinner, member_name)
@@ -162,19 +159,17 @@ class IncomeScreen(Screen):
         self.member_spinner.values = self._member_values()
         self.update_list()
 
+    @timed("income.update_list")
     def update_list(self):
-        self.box_list.clear_widgets()
-        db_loc = self.db or App.get_running_app().db
-        history = db_loc.get_history()
-        incomes = [h for h in history if h[0] == "income"]
-        for typ, amount, category, desc, date, member_id in incomes:
-            member_name = db_loc.get_member_name(member_id)
-            lbl = Label(text=f"{date} [{member_name}] [{category}] +{amount} ₽ ({desc})",
-                        size_hint_y=None, height=dp(28), halign="left", valign="middle", color=(0.2, 1, 0.6, 1))
-            lbl.bind(size=lbl.setter("text_size"))
-            self.box_list.add_widget(lbl)
+        self.history_view.reload()
 
+    @timed("income.on_pre_enter")
     def on_pre_enter(self, *args):
+        if self._changes is None:
+            self._changes = DirtyFlag(self.db or App.get_running_app().db,
+                                      MEMBER_EVENTS | {HISTORY_ADDED, BALANCE_CHANGED})
+        if not self._changes.consume():
+            return
         self.member_spinner.values = self._member_values()
         self.member_spinner.text = "Я"
         self.on_member_select(self.member_spinner, "Я")
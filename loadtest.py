@@ -0,0 +1,171 @@
+# loadtest.py
+"""
+Нагрузочный клиент для server.py: users виртуальных пользователей одновременно
+регистрируются, входят и в цикле выполняют смесь запросов; результат — JSON
+с пропускной способностью и задержками (mean, p50, p95, p99, max) по каждой операции.
+
+  python server.py --db /tmp/load.db &
+  python loadtest.py --users 20 --duration 10 --out load.json
+
+Каждый пользователь держит одно соединение (keep-alive) и отправляет запросы последовательно,
+так что users — это и число одновременных запросов.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from server import HOST, PORT
+
+# операция -> вес в смеси запросов
+MIX = {"add_history": 3, "balance": 3, "history": 3, "members": 1, "report": 1}
+PASSWORD = "password"
+
+
+class Client:
+    """Минимальный HTTP/1.1-клиент с одним keep-alive соединением и JSON в теле."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.token: Optional[str] = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(data)}\r\n"
+        if self.token:
+            head += f"Authorization: Bearer {self.token}\r\n"
+        self._writer.write((head + "\r\n").encode("latin-1") + data)
+        await self._writer.drain()
+
+        status_line, *lines = (await self._reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        headers = {}
+        for line in lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        payload = await self._reader.readexactly(int(headers.get("content-length") or 0))
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return int(status_line.split(" ")[1]), json.loads(payload) if payload else None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+            self._writer = None
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+async def _user(n: int, args, prefix: str, deadline: float, latencies: Dict[str, List[float]],
+                errors: Dict[str, int], rnd: random.Random):
+    client = Client(args.host, args.port)
+    ops, weights = zip(*MIX.items())
+
+    async def call(op: str, method: str, path: str, body=None, ok=(200, 201)):
+        t = time.perf_counter()
+        try:
+            status, payload = await client.request(method, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await client.close()
+            status, payload = 0, None
+        latencies.setdefault(op, []).append((time.perf_counter() - t) * 1000)
+        if status not in ok:
+            errors[f"{op}:{status}"] = errors.get(f"{op}:{status}", 0) + 1
+        return status, payload
+
+    username = f"{prefix}-{n}"
+    # 409 — пользователь остался от прошлого запуска с тем же --prefix
+    await call("register", "POST", "/register", {"username": username, "password": PASSWORD}, ok=(201, 409))
+    status, payload = await call("login", "POST", "/login", {"username": username, "password": PASSWORD})
+    if status != 200:
+        await client.close()
+        return
+    client.token = payload["token"]
+    await call("add_member", "POST", "/members", {"name": "Мама", "role": "Мама"})
+    done = 0
+    while time.perf_counter() < deadline and (not args.requests or done < args.requests):
+        op = rnd.choices(ops, weights)[0]
+        if op == "add_history":
+            ttype = "income" if rnd.random() < 0.2 else "expense"
+            await call(op, "POST", "/history", {"type": ttype, "amount": rnd.randint(50, 10000),
+                                                "category": "Прочее", "member": rnd.choice(["Я", "Мама"])})
+        elif op == "balance":
+            await call(op, "GET", "/balance")
+        elif op == "history":
+            await call(op, "GET", "/history?limit=50")
+        elif op == "members":
+            await call(op, "GET", "/members")
+        else:
+            await call(op, "GET", "/report?period=month")
+        done += 1
+    await call("logout", "POST", "/logout")
+    await client.close()
+
+
+async def run(args) -> Dict[str, Any]:
+    prefix = args.prefix or f"load{datetime.now():%H%M%S}"
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    rnd = random.Random(args.seed)
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(_user(n, args, prefix, deadline, latencies, errors, random.Random(rnd.random()))
+                           for n in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for op, values in sorted(latencies.items()):
+        values.sort()
+        results[op] = {"count": len(values), "mean_ms": round(sum(values) / len(values), 3),
+                       "p50_ms": round(_percentile(values, 0.5), 3), "p95_ms": round(_percentile(values, 0.95), 3),
+                       "p99_ms": round(_percentile(values, 0.99), 3), "max_ms": round(values[-1], 3)}
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "host": args.host, "port": args.port,
+                 "users": args.users, "duration_s": round(elapsed, 3), "seed": args.seed},
+        "total": {"requests": total, "rps": round(total / elapsed, 1) if elapsed else 0.0,
+                  "errors": sum(errors.values())},
+        "results": results,
+        "errors": errors,
+    }
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест server.py")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--users", type=int, default=10, help="одновременных пользователей")
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд")
+    parser.add_argument("--requests", type=int, default=0, help="запросов на пользователя (0 — до конца duration)")
+    parser.add_argument("--prefix", help="префикс имён пользователей (по умолчанию по времени запуска)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="файл для JSON (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+
+    res = asyncio.run(run(args))
+    out = json.dumps(res, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fp:
+            fp.write(out + "\n")
+    else:
+        print(out)
+    return 1 if res["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -12,6 +12,9 @@ from kivy.animation import Animation
 from kivy.metrics import dp
 from kivy.properties import ListProperty, StringProperty, NumericProperty
 from kivy.app import App
+from kivy.logger import Logger
+from profiling import timed
+from db_events import DirtyFlag
 
 
 class CardButton(ButtonBehavior, BoxLayout):
@@ -92,6 +95,8 @@ class GoalProgressBar(BoxLayout):
 class MainScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        # поднимается любым изменением данных (db_events); создаётся при первом показе
+        self._changes = None
 
         with self.canvas.before:
             Color(0.08, 0.08, 0.12, 1)
@@ -124,6 +129,7 @@ class MainScreen(Screen):
         self.lbl_goal_status.bind(size=self.lbl_goal_status.setter("text_size"))
 
         # ---------- Spinner выбора ----------
+        self._balance_seq = 0
         app = App.get_running_app()
         self.members = app.db.get_all_members_with_summary()
         names = ["Все"] + [m["name"] for m in self.members]
@@ -176,10 +182,16 @@ class MainScreen(Screen):
         self._bg_rect.pos = self.pos
         self._bg_rect.size = self.size
 
+    @timed("main.on_pre_enter")
     def on_pre_enter(self, *args):
+        if self._changes is None:
+            self._changes = DirtyFlag(App.get_running_app().db)
+        if not self._changes.consume():
+            return
         self.update_members()
         self.update_balance_display()
 
+    @timed("main.update_members")
     def update_members(self):
         app = App.get_running_app()
         self.members = app.db.get_all_members_with_summary()
@@ -191,9 +203,23 @@ class MainScreen(Screen):
     def on_member_select(self, spinner, name):
         self.update_balance_display()
 
+    @timed("main.update_balance_display")
     def update_balance_display(self):
-        app = App.get_running_app()
-        db = app.db
+        # баланс и цель читаются в фоновом потоке, отрисовка — когда придут данные
+        self._balance_seq += 1
+        seq = self._balance_seq
+        App.get_running_app().db_async.submit(lambda db: (db.get_balance(), db.get_goal()),
+                                              callback=lambda res: self._render_balance(seq, *res),
+                                              errback=lambda exc: self._balance_failed(seq, exc))
+
+    def _balance_failed(self, seq, exc):
+        Logger.exception("MainScreen: не удалось прочитать баланс", exc_info=exc)
+        if seq == self._balance_seq:
+            self.lbl_goal_status.text = "Не удалось загрузить баланс"
+
+    def _render_balance(self, seq, my_balance, target):
+        if seq != self._balance_seq:
+            return
         selected = self.spinner_member.text
 
         # Если выбран "Все" — общий баланс семьи
@@ -201,7 +227,7 @@ class MainScreen(Screen):
             total_balance = 0
             for m in self.members:
                 if m["name"] == "Я":
-                    total_balance += db.get_balance()
+                    total_balance += my_balance
                 else:
                     total_balance += m["balance"]
             self.lbl_balance_amount.text = f"₽ {total_balance:,.2f}"
@@ -213,8 +239,7 @@ class MainScreen(Screen):
         member = next((m for m in self.members if m["name"] == selected), None)
         if member:
             if selected == "Я":
-                bal = db.get_balance()
-                target = db.get_goal()
+                bal = my_balance
                 progress = min(1, bal / target) if target > 0 else 0
                 self.goal_bar.animate_to(progress)
                 self.lbl_goal_status.text = f"Цель: {bal:,.0f} / {target:,.0f} ₽" if target > 0 else f"Баланс: {bal:,.0f} ₽"
@@ -0,0 +1,212 @@
+# profiling.py
+"""
+Статистика времени выполнения: SQL-запросы Database и методы экранов.
+
+  Stats           — счётчик по именам: число вызовов, суммарное/максимальное время, p95;
+  TracedConnection — соединение sqlite3, которое пишет в Stats время каждого запроса
+                     (execute/executemany вместе с чтением строк через fetch* или итерацию);
+  SCREEN_STATS, timed(name) — время refresh / update_list / on_pre_enter экранов;
+  dump_json(path_or_fp, db) — всё вместе в JSON.
+
+Запросы дольше slow_ms пишутся в лог "finance.sql" (logging, WARNING).
+Много вызовов с малым временем у одного запроса (например, имя участника по id для каждой строки)
+— признак N+1: смотрите на count.
+"""
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+SLOW_MS = 100.0
+SAMPLES = 512
+
+sql_log = logging.getLogger("finance.sql")
+_spaces = re.compile(r"\s+")
+
+
+class Stats:
+    """Потокобезопасная статистика длительностей по именам (для p95 хранятся последние SAMPLES значений)."""
+
+    def __init__(self, slow_ms: Optional[float] = None, logger: Optional[logging.Logger] = None):
+        self.slow_ms = slow_ms
+        self.logger = logger
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._items: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, name: str, seconds: float):
+        ms = seconds * 1000
+        with self._lock:
+            item = self._items.get(name)
+            if item is None:
+                item = self._items[name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                            "samples": deque(maxlen=SAMPLES)}
+            item["count"] += 1
+            item["total_ms"] += ms
+            if ms > item["max_ms"]:
+                item["max_ms"] = ms
+            samples: Deque[float] = item["samples"]
+            samples.append(ms)
+        if self.slow_ms is not None and ms >= self.slow_ms and self.logger is not None:
+            self.logger.warning("%.1f ms: %s", ms, name)
+
+    def reset(self):
+        with self._lock:
+            self._items.clear()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """[{name, count, total_ms, mean_ms, p95_ms, max_ms}, ...] по убыванию суммарного времени."""
+        with self._lock:
+            items = [(name, dict(item, samples=sorted(item["samples"]))) for name, item in self._items.items()]
+        res = []
+        for name, item in items:
+            samples = item["samples"]
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0.0
+            res.append({"name": name, "count": item["count"], "total_ms": round(item["total_ms"], 3),
+                        "mean_ms": round(item["total_ms"] / item["count"], 3), "p95_ms": round(p95, 3),
+                        "max_ms": round(item["max_ms"], 3)})
+        res.sort(key=lambda r: -r["total_ms"])
+        return res
+
+
+def normalize_sql(sql: str) -> str:
+    """Текст запроса в одну строку — ключ статистики (параметры в запросах передаются через ?)."""
+    return _spaces.sub(" ", sql).strip()
+
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    Курсор, который копит время execute и всех fetch* одного запроса
+    и записывает его в connection.stats, когда строки прочитаны до конца или курсор закрыт.
+    """
+    _trace: Optional[list] = None
+
+    def _finish(self):
+        trace, self._trace = self._trace, None
+        if trace is not None:
+            self.connection.stats.record(trace[0], trace[1])
+
+    def _timed(self, fn, *args):
+        t = time.perf_counter()
+        try:
+            return fn(*args)
+        except BaseException:
+            if self._trace is not None:
+                self._trace[1] += time.perf_counter() - t
+            self._finish()
+            raise
+        finally:
+            if self._trace is not None:
+                self._trace[1] += time.perf_counter() - t
+
+    def _start(self, sql: str) -> bool:
+        self._finish()
+        stats = getattr(self.connection, "stats", None)
+        if stats is None or not stats.enabled:
+            return False
+        self._trace = [normalize_sql(sql), 0.0]
+        return True
+
+    def execute(self, sql, parameters=(), /):
+        if not self._start(sql):
+            return super().execute(sql, parameters)
+        self._timed(super().execute, sql, parameters)
+        return self
+
+    def executemany(self, sql, parameters, /):
+        if not self._start(sql):
+            return super().executemany(sql, parameters)
+        self._timed(super().executemany, sql, parameters)
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # курсор без fetch (INSERT/UPDATE) или брошенный на середине
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3.Connection с курсорами TracedCursor: время запросов пишется в self.stats (если задан)."""
+    stats: Optional[Stats] = None
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute создаёт обычный курсор, минуя cursor(), поэтому переопределяем и его
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters, /):
+        return self.cursor().executemany(sql, parameters)
+
+
+# ---------- экраны ----------
+SCREEN_STATS = Stats(slow_ms=SLOW_MS, logger=logging.getLogger("finance.screens"))
+
+
+def timed(name: str, stats: Stats = SCREEN_STATS) -> Callable:
+    """Декоратор: время вызова метода попадает в stats под именем name."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not stats.enabled:
+                return fn(*args, **kwargs)
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats.record(name, time.perf_counter() - t)
+        return wrapper
+    return decorator
+
+
+def report(db=None) -> Dict[str, Any]:
+    res: Dict[str, Any] = {"screens": SCREEN_STATS.snapshot()}
+    if db is not None:
+        res["sql"] = db.stats.snapshot()
+    return res
+
+
+def dump_json(target, db=None):
+    """Пишет report(db) в JSON: target — путь или открытый текстовый файл."""
+    data = json.dumps(report(db), ensure_ascii=False, indent=2)
+    if hasattr(target, "write"):
+        target.write(data)
+    else:
+        with open(target, "w", encoding="utf-8") as fp:
+            fp.write(data)
@@ -0,0 +1,88 @@
+# reports.py
+"""
+Расчёты аналитики без Kivy: то, что экран аналитики показывает на диаграммах,
+доступно и из командной строки (cli.py), и из замеров (bench.py).
+
+  AnalyticsReport.query(db, mode, member, date_from, date_to) — участники, суммы по категориям и по дням;
+  top_n(data) — крупнейшие категории и "Другое" для круговой диаграммы;
+  summary(db, ...) — сводка по текущему пользователю (баланс, цель, участники, доходы и расходы).
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from analytics_cache import AnalyticsCache
+
+ALL_MEMBERS = "Все участники"
+
+# на диаграмме не больше PIE_TOP_N секторов: мелкие категории собираются в "Другое"
+PIE_TOP_N = 6
+OTHER_LABEL = "Другое"
+
+
+def top_n(data, n=PIE_TOP_N, other=OTHER_LABEL):
+    """Первые n - 1 категорий по сумме и сумма остальных под именем other."""
+    items = sorted(((k, v) for k, v in (data or {}).items() if v > 0), key=lambda x: -x[1])
+    if len(items) <= n:
+        return dict(items)
+    res = dict(items[:n - 1])
+    res[other] = res.get(other, 0) + sum(v for _, v in items[n - 1:])
+    return res
+
+
+class AnalyticsReport:
+    """
+    Данные экрана аналитики. Между вызовами хранит кэш агрегатов (AnalyticsCache)
+    или колоночный снимок истории (columnar=True, нужен NumPy).
+    """
+
+    def __init__(self, columnar: bool = False):
+        if columnar:
+            # NumPy импортируется только для колоночного режима — CLI без него стартует быстрее
+            from columnar import HAVE_NUMPY
+            columnar = HAVE_NUMPY
+        self.columnar = columnar
+        self._cache = AnalyticsCache()
+        self._columnar = None
+
+    def query(self, db, mode: str, selected_member: str = ALL_MEMBERS,
+              date_from: Optional[int] = None, date_to: Optional[int] = None) -> Dict[str, Any]:
+        """{"members": [...], "categories": {категория: сумма}, "points": [(datetime дня, сумма), ...]}"""
+        members = [ALL_MEMBERS] + [m["name"] for m in db.get_family_members()]
+        if selected_member not in members:
+            selected_member = ALL_MEMBERS
+        # фильтр по участнику: None — все, иначе id участников с выбранным именем
+        member_ids = None if selected_member == ALL_MEMBERS else db.get_member_ids(selected_member)
+        if self.columnar:
+            # снимок перечитывается, только если данные изменились
+            if self._columnar is None or not self._columnar.is_current(db):
+                from columnar import ColumnarHistory
+                self._columnar = ColumnarHistory.load(db)
+            categories = self._columnar.category_totals(mode, member_ids, date_from, date_to)
+            points = self._columnar.bucket_totals(mode, "day", member_ids, date_from, date_to)
+        else:
+            # агрегаты считает SQLite (GROUP BY) или берутся из кэша, если данные не менялись;
+            # за период читаются только строки daily_rollup из этого диапазона дней
+            categories, daily = self._cache.get(db, mode, member_ids, date_from, date_to)
+            points = [(datetime.strptime(d, "%Y-%m-%d"), v) for d, v in daily]
+        return {
+            "members": members,
+            "categories": categories,
+            "points": points,
+        }
+
+
+def summary(db, date_from: Optional[int] = None, date_to: Optional[int] = None,
+            report: Optional[AnalyticsReport] = None) -> Dict[str, Any]:
+    """Сводка по текущему пользователю; суммы по категориям — за период [date_from, date_to)."""
+    report = report or AnalyticsReport()
+    res: Dict[str, Any] = {
+        "balance": db.get_balance(),
+        "goal": db.get_goal(),
+        "members": [{"name": m["name"], "income": m["income"], "expense": m["expense"]}
+                    for m in db.get_all_members_with_summary()],
+    }
+    for mode in ("income", "expense"):
+        categories = report.query(db, mode, ALL_MEMBERS, date_from, date_to)["categories"]
+        items: List[Tuple[str, float]] = sorted(categories.items(), key=lambda x: -x[1])
+        res[mode] = {"total": sum(v for _, v in items), "categories": dict(items)}
+    return res
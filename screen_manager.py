@@ -0,0 +1,32 @@
+# screen_manager.py
+from typing import Callable, Dict
+
+from kivy.uix.screenmanager import ScreenManager, Screen
+
+
+class LazyScreenManager(ScreenManager):
+    """
+    ScreenManager с отложенным созданием экранов.
+    register(name, factory) запоминает фабрику, а сам экран строится и добавляется
+    при первом обращении к нему (manager.current = name, get_screen(name)).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._factories: Dict[str, Callable[[], Screen]] = {}
+
+    def register(self, name: str, factory: Callable[[], Screen]):
+        """factory() должна вернуть экран с тем же name."""
+        self._factories[name] = factory
+
+    def _build(self, name: str):
+        factory = self._factories.pop(name, None)
+        if factory is not None:
+            self.add_widget(factory())
+
+    def get_screen(self, name):
+        self._build(name)
+        return super().get_screen(name)
+
+    def has_screen(self, name):
+        return name in self._factories or super().has_screen(name)
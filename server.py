@@ -0,0 +1,425 @@
+# server.py
+"""
+Локальный HTTP/JSON-сервис над Database на asyncio: несколько клиентов работают с одной базой.
+
+  python server.py --db finance.db --port 8765 --workers 4
+  python cli.py --db finance.db serve --port 8765
+
+Запросы к SQLite блокирующие, поэтому выполняются в пуле из workers потоков;
+если в работе и в очереди уже max_pending запросов, новые получают 503.
+Вместо общего Database.current_user_id у каждого клиента своя сессия: POST /login
+возвращает token, остальные запросы передают его в заголовке "Authorization: Bearer <token>",
+а поток пула выполняет запрос внутри db.session(user_id).
+С --commit-delay записи фиксируются группами, но перед каждым чтением Database фиксирует
+отложенное, поэтому GET видит результат предыдущего POST из любого потока пула.
+
+  POST   /register       {"username", "password"}
+  POST   /login          {"username", "password"}            -> {"token"}
+  POST   /logout
+  GET    /balance                                            -> {"balance", "goal"}
+  GET    /history?before_id=&limit=&type=                    -> {"items": [...]}
+  POST   /history        {"type", "amount", "category", "description", "date", "member"}
+  GET    /goal           PUT /goal {"target"}
+  GET    /members        POST /members {"name", "role", "color"}     DELETE /members/<id>
+  GET    /report?period=all|month|quarter|year                -> reports.summary
+
+По умолчанию слушает только 127.0.0.1: ни TLS, ни ограничения попыток входа здесь нет.
+Нагрузочный клиент — loadtest.py.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from database import DB_DEFAULT, Database, date_to_ts
+from reports import summary
+from timeseries import PERIODS, period_bounds
+
+HOST = "127.0.0.1"
+PORT = 8765
+WORKERS = 4
+MAX_PENDING = 64
+SESSION_TTL = 3600.0
+MAX_BODY = 1 << 20
+PAGE_LIMIT = 500
+
+log = logging.getLogger("finance.server")
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Sessions:
+    """token -> user_id; сессия истекает через ttl секунд без запросов. Используется только из цикла asyncio."""
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+        self._items: Dict[str, List[Any]] = {}
+        self._purged = time.monotonic()
+
+    def create(self, user_id: int) -> str:
+        now = time.monotonic()
+        if now - self._purged > self.ttl:
+            # брошенные сессии (без logout) удаляются не чаще раза в ttl
+            self._purged = now
+            self._items = {t: item for t, item in self._items.items() if now - item[1] <= self.ttl}
+        token = secrets.token_urlsafe(24)
+        self._items[token] = [user_id, now]
+        return token
+
+    def get(self, token: Optional[str]) -> Optional[int]:
+        item = self._items.get(token) if token else None
+        if item is None:
+            return None
+        now = time.monotonic()
+        if now - item[1] > self.ttl:
+            del self._items[token]
+            return None
+        item[1] = now
+        return item[0]
+
+    def drop(self, token: Optional[str]):
+        self._items.pop(token, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+# ---------- обработчики (выполняются в потоке пула, внутри db.session) ----------
+def _text(body: Dict[str, Any], key: str, required: bool = True) -> str:
+    value = body.get(key)
+    if value is None and not required:
+        return ""
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise ApiError(400, f"Поле {key!r}: нужна непустая строка")
+    return value.strip()
+
+
+def _number(body: Dict[str, Any], key: str) -> float:
+    value = body.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ApiError(400, f"Поле {key!r}: нужно число")
+    try:
+        value = float(value)
+    except OverflowError:
+        value = math.inf
+    # 1e309 и NaN json.loads принимает, но в суммы они попасть не должны
+    if not math.isfinite(value):
+        raise ApiError(400, f"Поле {key!r}: нужно конечное число")
+    return value
+
+
+def _register(db: Database, body, query):
+    if not db.register_user(_text(body, "username"), _text(body, "password")):
+        raise ApiError(409, "Пользователь уже существует")
+    return 201, {"ok": True}
+
+
+def _balance(db: Database, body, query):
+    return 200, {"balance": db.get_balance(), "goal": db.get_goal()}
+
+
+def _history(db: Database, body, query):
+    try:
+        before_id = int(query["before_id"]) if query.get("before_id") else None
+        limit = min(int(query.get("limit") or 50), PAGE_LIMIT)
+    except ValueError:
+        raise ApiError(400, "before_id и limit — целые числа")
+    if limit < 1:
+        # LIMIT -1 в SQLite — без ограничения
+        raise ApiError(400, "limit должен быть больше нуля")
+    filters = {"type": query["type"]} if query.get("type") else None
+    rows = db.get_history_page(before_id, limit, filters)
+    keys = ("id", "type", "amount", "category", "description", "date", "member_id")
+    return 200, {"items": [dict(zip(keys, r)) for r in rows]}
+
+
+def _add_history(db: Database, body, query):
+    ttype = body.get("type")
+    if ttype not in ("income", "expense"):
+        raise ApiError(400, "type: income или expense")
+    amount = _number(body, "amount")
+    if amount <= 0:
+        raise ApiError(400, "amount должен быть больше нуля")
+    member = _text(body, "member", False) or "Я"
+    member_id = db.get_member_id(member)
+    if member_id is None and member != "Я":
+        raise ApiError(400, f"Нет участника {member!r}")
+    date = _text(body, "date", False) or None
+    if date is not None and date_to_ts(date) is None:
+        # запись без ts не попала бы ни в отчёты за период, ни в daily_rollup по дням
+        raise ApiError(400, "date: дд.мм.гггг или дд.мм.гггг чч:мм")
+    # как на экранах дохода и расхода: доход "Я" пополняет balance в той же транзакции
+    with db.transaction():
+        db.add_history(ttype, amount, _text(body, "category", False) or "Прочее", _text(body, "description", False),
+                       date, member_id)
+        if ttype == "income" and member_id is None:
+            db.adjust_balance(amount)
+    return 201, {"ok": True}
+
+
+def _goal(db: Database, body, query):
+    return 200, {"goal": db.get_goal()}
+
+
+def _set_goal(db: Database, body, query):
+    db.set_goal(_number(body, "target"))
+    return 200, {"goal": db.get_goal()}
+
+
+def _members(db: Database, body, query):
+    return 200, {"items": db.get_all_members_with_summary()}
+
+
+def _add_member(db: Database, body, query):
+    new_id = db.add_family_member(_text(body, "name"), _text(body, "role", False),
+                                  body.get("color") or "#6C5CE7", "")
+    if new_id is None:
+        raise ApiError(409, "Достигнут лимит членов семьи")
+    return 201, {"id": new_id}
+
+
+def _remove_member(db: Database, member_id: int):
+    if member_id not in {m["id"] for m in db.get_family_members()}:
+        raise ApiError(404, "Нет такого участника")
+    db.remove_family_member(member_id)
+    return 200, {"ok": True}
+
+
+def _report(db: Database, body, query):
+    period = query.get("period") or "all"
+    if period not in PERIODS:
+        raise ApiError(400, f"period: {', '.join(PERIODS)}")
+    return 200, summary(db, *period_bounds(period))
+
+
+Handler = Callable[[Database, Dict[str, Any], Dict[str, str]], Tuple[int, Any]]
+# (метод, путь) -> обработчик; все, кроме /register, требуют сессию
+ROUTES: Dict[Tuple[str, str], Handler] = {
+    ("POST", "/register"): _register,
+    ("GET", "/balance"): _balance,
+    ("GET", "/history"): _history,
+    ("POST", "/history"): _add_history,
+    ("GET", "/goal"): _goal,
+    ("PUT", "/goal"): _set_goal,
+    ("GET", "/members"): _members,
+    ("POST", "/members"): _add_member,
+    ("GET", "/report"): _report,
+}
+PUBLIC = {"/register", "/login"}
+
+
+class ApiServer:
+    def __init__(self, db: Database, host: str = HOST, port: int = PORT, workers: int = WORKERS,
+                 max_pending: int = MAX_PENDING, session_ttl: float = SESSION_TTL):
+        self.db = db
+        self.host = host
+        self.port = port
+        self.max_pending = max_pending
+        self.sessions = Sessions(session_ttl)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fu-db")
+        self._pending = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # ---------- запуск ----------
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        # при port=0 система выбирает свободный порт
+        self.port = self._server.sockets[0].getsockname()[1]
+        log.info("Сервер слушает http://%s:%d", self.host, self.port)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    # ---------- выполнение в пуле ----------
+    def _call(self, user_id: Optional[int], fn: Callable[..., Any], args: Tuple[Any, ...]):
+        with self.db.session(user_id):
+            return fn(self.db, *args)
+
+    async def _run(self, user_id: Optional[int], fn: Callable[..., Any], *args):
+        if self._pending >= self.max_pending:
+            raise ApiError(503, "Сервер перегружен, повторите запрос позже")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._call, user_id, fn, args)
+        finally:
+            self._pending -= 1
+
+    # ---------- HTTP ----------
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                keep_alive = True
+                try:
+                    method, target, version, headers = self._parse_head(head)
+                    try:
+                        length = self._content_length(headers)
+                    except ApiError:
+                        # без верной длины не найти конец тела и начало следующего запроса
+                        keep_alive = False
+                        raise
+                    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                    raw = await reader.readexactly(length) if length else b""
+                    status, payload = await self._dispatch(method, target, headers, raw)
+                except ApiError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except asyncio.IncompleteReadError:
+                    return
+                except Exception:
+                    log.exception("Ошибка обработки запроса")
+                    status, payload = 500, {"error": "Внутренняя ошибка сервера"}
+                self._write(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_head(head: bytes) -> Tuple[str, str, str, Dict[str, str]]:
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise ApiError(400, "Некорректная строка запроса")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        return method.upper(), target, version, headers
+
+    @staticmethod
+    def _content_length(headers: Dict[str, str]) -> int:
+        """Длина тела: неотрицательное целое не больше MAX_BODY (проверяется до чтения тела)."""
+        value = headers.get("content-length", "")
+        if not value:
+            return 0
+        if not (value.isascii() and value.isdigit()):
+            raise ApiError(400, "Content-Length: нужно неотрицательное целое число")
+        length = int(value)
+        if length > MAX_BODY:
+            raise ApiError(413, "Слишком большой запрос")
+        return length
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + data)
+
+    async def _dispatch(self, method: str, target: str, headers: Dict[str, str], raw: bytes) -> Tuple[int, Any]:
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            raise ApiError(400, "Тело запроса — не JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "Тело запроса — JSON-объект")
+
+        token = None
+        auth = headers.get("authorization", "")
+        if auth.startswith("Bearer "):
+            token = auth[7:].strip()
+        user_id = None
+        if path not in PUBLIC:
+            user_id = self.sessions.get(token)
+            if user_id is None:
+                raise ApiError(401, "Нужен вход: POST /login")
+
+        if (method, path) == ("POST", "/login"):
+            user_id = await self._run(None, _login, _text(body, "username"), _text(body, "password"))
+            if user_id is None:
+                raise ApiError(401, "Неверный логин или пароль")
+            return 200, {"token": self.sessions.create(user_id)}
+        if (method, path) == ("POST", "/logout"):
+            self.sessions.drop(token)
+            return 200, {"ok": True}
+        if path.startswith("/members/"):
+            if method != "DELETE":
+                raise ApiError(405, "Метод не поддерживается")
+            try:
+                member_id = int(path[len("/members/"):])
+            except ValueError:
+                raise ApiError(404, "Нет такого участника")
+            return await self._run(user_id, _remove_member, member_id)
+        handler = ROUTES.get((method, path))
+        if handler is None:
+            if any(p == path for _, p in ROUTES):
+                raise ApiError(405, "Метод не поддерживается")
+            raise ApiError(404, "Нет такого адреса")
+        return await self._run(user_id, handler, body, query)
+
+
+def _login(db: Database, username: str, password: str) -> Optional[int]:
+    # внутри session() login_user меняет только пользователя потока
+    return db.current_user_id if db.login_user(username, password) else None
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="HTTP/JSON-сервис над базой (asyncio)")
+    parser.add_argument("--db", default=DB_DEFAULT)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="потоков для запросов к SQLite")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="запросов в работе, дальше — 503")
+    parser.add_argument("--commit-delay", type=float, default=None,
+                        help="групповой commit: задержка фиксации в секундах; чтения видят все "
+                             "принятые записи, откладывается только fsync (см. Database)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    db = Database(args.db, commit_delay=args.commit_delay)
+    server = ApiServer(db, args.host, args.port, args.workers, args.max_pending)
+
+    async def run():
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,98 @@
+# synthetic.py
+"""
+Воспроизводимый генератор тестовых данных: пользователи, члены семьи и history.
+
+  python synthetic.py bench.db --users 10 --members 3 --rows 1000000 --seed 1
+
+Одинаковые параметры и seed дают одинаковые данные. Пользователи — user1..userN
+с паролем "password"; строки history распределены между пользователями поровну,
+даты — равномерно за последние years лет. Запись идёт пакетами через add_history_many.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+PASSWORD = "password"
+BATCH_SIZE = 10000
+INCOME_SHARE = 0.2
+MEMBER_NAMES = ["Мама", "Папа", "Сын", "Дочь", "Бабушка"]
+INCOME_CATEGORIES = ["Зарплата", "Подработка / Фриланс", "Бонусы / Премии", "Проценты", "Подарки", "Прочее"]
+
+
+def generate(db, users: int = 1, members: int = 2, rows: int = 10000, seed: int = 0,
+             years: int = 3, start: Optional[datetime] = None, progress=None) -> Dict[str, Any]:
+    """
+    Заполняет базу (объект Database). members — членов семьи у каждого пользователя
+    помимо "Я" (не больше 4, лимит add_family_member). Возвращает сводку: user_ids, rows.
+    progress(done, total) вызывается после каждого пакета.
+    """
+    rnd = random.Random(seed)
+    end = start or datetime(2025, 1, 1)
+    begin = end - timedelta(days=365 * years)
+    span = int((end - begin).total_seconds() // 60)
+    expense_categories = db.get_all_categories()
+    user_ids: List[int] = []
+    done = 0
+    for u in range(users):
+        username = f"user{u + 1}"
+        db.register_user(username, PASSWORD)
+        if not db.login_user(username, PASSWORD):
+            raise RuntimeError(f"Не удалось войти как {username}")
+        user_ids.append(db.current_user_id)
+        member_ids: List[Optional[int]] = [None]
+        for name in MEMBER_NAMES[:max(0, min(members, 4))]:
+            mid = db.add_family_member(name, name, "#6C5CE7", "")
+            if mid is not None:
+                member_ids.append(mid)
+        # остаток от деления достаётся первым пользователям
+        count = rows // users + (1 if u < rows % users else 0)
+        batch = []
+        for _ in range(count):
+            dt = begin + timedelta(minutes=rnd.randrange(span))
+            if rnd.random() < INCOME_SHARE:
+                row = ("income", rnd.randint(1000, 100000), rnd.choice(INCOME_CATEGORIES))
+            else:
+                row = ("expense", rnd.randint(50, 10000), rnd.choice(expense_categories))
+            batch.append(row + ("", dt.strftime("%d.%m.%Y %H:%M"), rnd.choice(member_ids)))
+            if len(batch) == BATCH_SIZE:
+                done += db.add_history_many(batch)
+                batch = []
+                if progress:
+                    progress(done, rows)
+        if batch:
+            done += db.add_history_many(batch)
+            if progress:
+                progress(done, rows)
+    db.logout()
+    return {"user_ids": user_ids, "rows": done}
+
+
+def main(argv: List[str]) -> int:
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Заполняет базу синтетическими данными")
+    parser.add_argument("db", help="путь к файлу базы (будет создан)")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--members", type=int, default=2, help="членов семьи у пользователя помимо 'Я' (до 4)")
+    parser.add_argument("--rows", type=int, default=100000, help="всего строк history")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    db = Database(args.db, slow_ms=None)
+    t = time.perf_counter()
+    try:
+        res = generate(db, args.users, args.members, args.rows, args.seed, args.years,
+                       progress=lambda done, total: print(f"\r{done}/{total}", end="", file=sys.stderr))
+    finally:
+        db.close()
+    print(file=sys.stderr)
+    print(f"Пользователей: {len(res['user_ids'])}, записей: {res['rows']}, {time.perf_counter() - t:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,35 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# модули приложения лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    """Фабрика баз во временном каталоге; все открытые базы закрываются после теста."""
+    opened = []
+
+    def make(name="test.db", **kwargs):
+        kwargs.setdefault("slow_ms", None)
+        db = Database(str(tmp_path / name), **kwargs)
+        opened.append(db)
+        return db
+
+    yield make
+    for db in opened:
+        db.close()
+
+
+@pytest.fixture
+def user_db(make_db):
+    """База с вошедшим пользователем anna."""
+    db = make_db()
+    db.register_user("anna", "pw")
+    assert db.login_user("anna", "pw")
+    return db
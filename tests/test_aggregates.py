@@ -0,0 +1,129 @@
+# tests/test_aggregates.py
+"""Агрегаты, которые ведут триггеры на history, совпадают с пересчётом SUM по history после каждой операции."""
+from datetime import date
+
+import pytest
+
+from database import date_to_ts
+from timeseries import day_bounds
+
+
+def _sql(sql, *params):
+    def op(db, ids):
+        with db.transaction() as conn:
+            conn.execute(sql, [ids.get(p, p) for p in params])
+    return op
+
+
+def _set_date(db, ids):
+    # дата и ts меняются вместе, как при вставке
+    with db.transaction() as conn:
+        conn.execute("UPDATE history SET date = ?, ts = ? WHERE id = ?",
+                     ("15.04.2024 09:00", date_to_ts("15.04.2024 09:00"), ids["mom_row"]))
+
+
+OPERATIONS = {
+    "insert": lambda db, ids: db.add_history("expense", 12.5, "Еда", "", "01.03.2024 18:00", ids["mom"]),
+    "insert_many": lambda db, ids: db.add_history_many([("income", 1000, "Зарплата", "", "05.03.2024", None),
+                                                        ("expense", 64, "", "", "05.03.2024", "Папа")]),
+    "delete": _sql("DELETE FROM history WHERE id = ?", "mom_row"),
+    "update_amount": _sql("UPDATE history SET amount = 250 WHERE id = ?", "mom_row"),
+    "update_type": _sql("UPDATE history SET type = 'income' WHERE id = ?", "mom_row"),
+    "update_date": _set_date,
+    "update_category": _sql("UPDATE history SET category = '' WHERE id = ?", "mom_row"),
+    "update_member": _sql("UPDATE history SET member_id = ? WHERE id = ?", "dad", "mom_row"),
+    "remove_member": lambda db, ids: db.remove_family_member(ids["mom"]),
+}
+
+
+@pytest.fixture
+def seeded(user_db):
+    """anna с двумя участниками и записями за несколько дней; у boris — свои записи."""
+    db = user_db
+    ids = {"mom": db.add_family_member("Мама", "Мама"), "dad": db.add_family_member("Папа", "Папа")}
+    db.add_history("income", 5000, "Зарплата", "", "01.03.2024 09:00")
+    db.add_history("expense", 300, "Еда", "", "01.03.2024 12:00", ids["mom"])
+    db.add_history("expense", 75.25, "Транспорт", "", "02.03.2024 08:30", ids["dad"])
+    db.add_history("expense", 40, "Еда", "", "02.03.2024 19:00")
+    db.add_history("expense", 10, "Еда", "", "без даты", ids["mom"])
+    ids["mom_row"] = db._execute("SELECT MIN(id) FROM history WHERE member_id = ?", (ids["mom"],)).fetchone()[0]
+    anna = db.current_user_id
+    db.register_user("boris", "pw")
+    db.login_user("boris", "pw")
+    db.add_history("expense", 99, "Еда", "", "01.03.2024 12:00")
+    db.current_user_id = anna
+    return db, ids
+
+
+def _history(db):
+    return db._execute("SELECT * FROM history ORDER BY id").fetchall()
+
+
+def _member_balance(db):
+    return sorted(db._execute(
+        "SELECT user_id, member_id, income, expense FROM member_balance WHERE income != 0 OR expense != 0"
+    ).fetchall())
+
+
+def _member_balance_from_history(db):
+    return sorted(db._execute("""
+        SELECT user_id, IFNULL(member_id, 0),
+               IFNULL(SUM(CASE WHEN type='income' THEN amount END), 0),
+               IFNULL(SUM(CASE WHEN type='expense' THEN amount END), 0)
+        FROM history GROUP BY 1, 2
+    """).fetchall())
+
+
+@pytest.mark.parametrize("op", list(OPERATIONS))
+def test_member_balance_matches_history(seeded, op):
+    db, ids = seeded
+    assert _member_balance(db) == _member_balance_from_history(db)
+    before = _history(db)
+    OPERATIONS[op](db, ids)
+    assert _history(db) != before
+    assert _member_balance(db) == _member_balance_from_history(db)
+    me = {m["name"]: m for m in db.get_all_members_with_summary()}
+    expected = {member_id: (income, expense) for user_id, member_id, income, expense
+                in _member_balance_from_history(db) if user_id == db.current_user_id}
+    assert (me["Папа"]["income"], me["Папа"]["expense"]) == expected.get(ids["dad"], (0, 0))
+
+
+def _daily_rollup(db):
+    return sorted(db._execute(
+        "SELECT user_id, member_id, type, category, day, total, count FROM daily_rollup"
+    ).fetchall())
+
+
+def _daily_rollup_from_history(db):
+    return sorted(db._execute("""
+        SELECT user_id, IFNULL(member_id, 0), type, COALESCE(NULLIF(category, ''), 'Прочее'),
+               IFNULL(date(ts, 'unixepoch'), ''), SUM(amount), COUNT(*)
+        FROM history GROUP BY 1, 2, 3, 4, 5
+    """).fetchall())
+
+
+@pytest.mark.parametrize("op", list(OPERATIONS))
+def test_daily_rollup_matches_history(seeded, op):
+    db, ids = seeded
+    assert _daily_rollup(db) == _daily_rollup_from_history(db)
+    before = _history(db)
+    OPERATIONS[op](db, ids)
+    assert _history(db) != before
+    assert _daily_rollup(db) == _daily_rollup_from_history(db)
+
+    # границы по суткам — get_category_totals и get_daily_totals читают daily_rollup
+    date_from, date_to = day_bounds(date(2024, 3, 1), date(2024, 4, 30))
+    for ttype in ("income", "expense"):
+        for member_ids in (None, [None], [ids["dad"]]):
+            members = "" if member_ids is None else " AND IFNULL(member_id, 0) = ?"
+            params = [db.current_user_id, ttype, date_from, date_to]
+            params += [] if member_ids is None else [member_ids[0] or 0]
+            where = f"user_id = ? AND type = ? AND ts >= ? AND ts < ?{members}"
+            categories = db._execute(
+                f"SELECT COALESCE(NULLIF(category, ''), 'Прочее'), SUM(amount) FROM history WHERE {where} GROUP BY 1",
+                params).fetchall()
+            days = db._execute(
+                f"SELECT date(ts, 'unixepoch'), SUM(amount) FROM history WHERE {where} GROUP BY 1 ORDER BY 1",
+                params).fetchall()
+            assert sorted(db.get_category_totals(ttype, member_ids, date_from, date_to)) == sorted(categories)
+            assert db.get_daily_totals(ttype, member_ids, date_from, date_to) == days
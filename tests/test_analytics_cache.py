@@ -0,0 +1,71 @@
+# tests/test_analytics_cache.py
+"""AnalyticsCache: дописанные строки досчитываются, правки и удаления (в т.ч. из другого процесса) — пересчёт."""
+import sqlite3
+
+from analytics_cache import AnalyticsCache
+
+
+def _fresh(db, mode, member_ids=None):
+    return dict(db.get_category_totals(mode, member_ids)), sorted(db.get_daily_totals(mode, member_ids))
+
+
+def _other_process(db, *statements):
+    conn = sqlite3.connect(db.db_name)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        for sql, params in statements:
+            conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_appended_rows_are_folded_in(user_db):
+    cache = AnalyticsCache()
+    user_db.add_history("expense", 100, "Еда", date="01.03.2024 10:00")
+    cache.get(user_db, "expense")
+    user_db.add_history("expense", 50, "Еда", date="02.03.2024 10:00")
+    assert cache.get(user_db, "expense") == _fresh(user_db, "expense")
+
+
+def test_delete_and_insert_in_other_process(user_db):
+    # число строк не меняется — заметить правку можно только по счётчику history_changes
+    cache = AnalyticsCache()
+    user_db.add_history("expense", 100, "Еда", date="01.03.2024 10:00")
+    user_db.add_history("expense", 200, "Дом", date="02.03.2024 10:00")
+    cache.get(user_db, "expense")
+    _other_process(
+        user_db,
+        ("DELETE FROM history WHERE category = ?", ("Дом",)),
+        ("INSERT INTO history (user_id, type, amount, category, description, date, ts) "
+         "SELECT user_id, 'expense', 7, 'Транспорт', '', date, ts FROM history LIMIT 1", ()),
+    )
+    assert cache.get(user_db, "expense") == _fresh(user_db, "expense")
+    assert "Дом" not in cache.get(user_db, "expense")[0]
+
+
+def test_update_amount_in_other_process(user_db):
+    cache = AnalyticsCache()
+    user_db.add_history("expense", 100, "Еда", date="01.03.2024 10:00")
+    cache.get(user_db, "expense")
+    _other_process(user_db, ("UPDATE history SET amount = 30", ()))
+    user_db.add_history("expense", 5, "Еда", date="01.03.2024 12:00")
+    assert cache.get(user_db, "expense") == ({"Еда": 35.0}, [("2024-03-01", 35.0)])
+
+
+def test_member_removed_in_other_process(user_db):
+    cache = AnalyticsCache()
+    mom = user_db.add_family_member("Мама", "Мама")
+    user_db.add_history("expense", 100, "Еда", date="01.03.2024 10:00", member_id=mom)
+    assert cache.get(user_db, "expense", [mom])[0] == {"Еда": 100.0}
+    # ON DELETE SET NULL переводит записи на 'Я'; members_generation этого объекта не меняется
+    _other_process(user_db, ("DELETE FROM family_members WHERE id = ?", (mom,)))
+    assert cache.get(user_db, "expense", [mom]) == _fresh(user_db, "expense", [mom]) == ({}, [])
+    assert cache.get(user_db, "expense", [None]) == _fresh(user_db, "expense", [None])
+
+
+def test_rebuild_aggregates_bumps_changes(user_db):
+    user_db.add_history("expense", 100, "Еда")
+    _, before = user_db.get_history_stats()
+    user_db.rebuild_aggregates()
+    assert user_db.get_history_stats()[1] > before
@@ -0,0 +1,89 @@
+# tests/test_async_errors.py
+"""Ошибки фоновых запросов доходят до экранов (нужен Kivy; окно не создаётся)."""
+import os
+import types
+
+import pytest
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+pytest.importorskip("kivy")
+
+from kivy.app import App  # noqa: E402
+from kivy.clock import Clock  # noqa: E402
+
+import history_view  # noqa: E402
+from db_worker import AsyncDatabase  # noqa: E402
+
+
+class RecordingWorker(AsyncDatabase):
+    """AsyncDatabase, который запоминает поставленные задачи, чтобы тест мог дождаться их."""
+
+    def __init__(self, db):
+        super().__init__(db)
+        self.futures = []
+
+    def submit(self, *args, **kwargs):
+        fut = super().submit(*args, **kwargs)
+        self.futures.append(fut)
+        return fut
+
+    def drain(self):
+        # результат доставляется в «главный поток» через Clock
+        for fut in self.futures:
+            try:
+                fut.result(timeout=5)
+            except Exception:
+                pass
+        self.futures = []
+        Clock.tick()
+
+
+@pytest.fixture
+def worker(user_db, monkeypatch):
+    worker = RecordingWorker(user_db)
+    monkeypatch.setattr(App, "get_running_app", staticmethod(lambda: types.SimpleNamespace(db=user_db, db_async=worker)))
+    yield worker
+    worker.shutdown()
+
+
+def test_errback_receives_exception(worker):
+    got = []
+
+    def job(db):
+        raise RuntimeError("boom")
+
+    worker.submit(job, callback=got.append, errback=lambda exc: got.append(("err", str(exc))))
+    worker.drain()
+    assert got == [("err", "boom")]
+
+
+def test_history_view_recovers_after_failed_page(worker, user_db, monkeypatch):
+    user_db.add_history("expense", 5, "Еда")
+    view = history_view.HistoryListView(db=user_db)
+    get_page = user_db.get_history_page
+    broken = [True]
+
+    def flaky(*args, **kwargs):
+        if broken[0]:
+            raise RuntimeError("database is locked")
+        return get_page(*args, **kwargs)
+
+    monkeypatch.setattr(user_db, "get_history_page", flaky)
+    view.load_more()
+    worker.drain()
+    assert view._loading is False
+    assert view.data[-1] == history_view.ERROR_ROW
+
+    # следующая подгрузка снова идёт в базу, строка ошибки убирается
+    broken[0] = False
+    view.load_more()
+    worker.drain()
+    assert len(view.data) == 1 and view.data[0] != history_view.ERROR_ROW
+
+
+def test_stale_failure_is_ignored(worker, user_db):
+    view = history_view.HistoryListView(db=user_db)
+    view._loading = True
+    view._page_failed(view._generation - 1, RuntimeError("old"))
+    assert view._loading is True and list(view.data) == []
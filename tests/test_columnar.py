@@ -0,0 +1,37 @@
+# tests/test_columnar.py
+"""ColumnarHistory совпадает с SQL, в т.ч. для дат до 1970 года и записей без даты."""
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from columnar import ColumnarHistory  # noqa: E402
+from timeseries import day_bounds  # noqa: E402
+
+
+@pytest.fixture
+def snap_db(user_db):
+    for amount, category, when in ((10, "Еда", "31.12.1969 23:00"), (20, "Дом", "15.06.1955"),
+                                   (30, "Еда", "01.01.1970 00:00"), (40, "Еда", "02.01.1970"),
+                                   (50, "Дом", "без даты")):
+        user_db.add_history("expense", amount, category, date=when)
+    return user_db
+
+
+def test_pre_epoch_dates_are_dated(snap_db):
+    snap = ColumnarHistory.load(snap_db)
+    assert snap.category_totals("expense") == dict(snap_db.get_category_totals("expense"))
+    assert snap.bucket_totals("expense") == [(datetime.strptime(d, "%Y-%m-%d"), v)
+                                             for d, v in snap_db.get_daily_totals("expense")]
+    assert snap.bucket_totals("expense")[:2] == [(datetime(1955, 6, 15), 20.0), (datetime(1969, 12, 31), 10.0)]
+
+
+def test_pre_epoch_range(snap_db):
+    snap = ColumnarHistory.load(snap_db)
+    date_from, date_to = day_bounds(date(1969, 12, 31), date(1970, 1, 1))
+    assert snap.category_totals("expense", None, date_from, date_to) == {"Еда": 40.0}
+    assert snap.bucket_totals("expense", "month", None, *day_bounds(date(1955, 1, 1), date(1969, 12, 31))) == [
+        (datetime(1955, 6, 1), 20.0), (datetime(1969, 12, 1), 10.0)]
+    # запись без даты входит только в итог без диапазона
+    assert snap.category_totals("expense")["Дом"] == 70.0
@@ -0,0 +1,116 @@
+# tests/test_group_commit.py
+"""Групповая фиксация (commit_delay): записи видны всем потокам, долговечность — отложенная."""
+import sqlite3
+import threading
+
+
+def _in_thread(fn):
+    res = []
+    t = threading.Thread(target=lambda: res.append(fn()))
+    t.start()
+    t.join(10)
+    return res[0]
+
+
+def _count(db):
+    return len(db.get_history())
+
+
+def _other_process_count(db):
+    conn = sqlite3.connect(db.db_name)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_write_is_visible_to_other_thread(make_db):
+    # таймер не сработает за время теста — видимость обеспечивает фиксация перед чтением
+    db = make_db(commit_delay=60)
+    db.register_user("anna", "pw")
+    db.login_user("anna", "pw")
+    for _ in range(6):
+        db.add_history("expense", 1, "Еда")
+    assert _in_thread(lambda: _count(db)) == 6
+
+    db.add_history("expense", 1, "Еда")
+    assert db._pending_conn is not None
+    assert _other_process_count(db) == 6
+    assert _in_thread(lambda: _count(db)) == 7
+    assert db._pending_conn is None
+    assert _other_process_count(db) == 7
+
+
+def test_writer_thread_reads_without_timer_race(make_db):
+    db = make_db(commit_delay=0.001)
+    db.register_user("anna", "pw")
+    db.login_user("anna", "pw")
+    errors = []
+
+    def writer():
+        try:
+            for i in range(200):
+                db.add_history("expense", 1, "Еда")
+                # чтение на соединении с отложенным commit, пока таймер мог сработать
+                assert _count(db) == i + 1
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            last = 0
+            for _ in range(200):
+                n = _count(db)
+                assert n >= last
+                last = n
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    assert errors == []
+    db.flush()
+    assert _other_process_count(db) == 200
+
+
+def test_read_inside_transaction_does_not_commit_it(make_db):
+    db = make_db(commit_delay=60)
+    db.register_user("anna", "pw")
+    db.login_user("anna", "pw")
+    db.add_history("expense", 1, "Еда")
+    try:
+        with db.transaction():
+            db.add_history("expense", 2, "Еда")
+            assert _count(db) == 2
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert _count(db) == 1
+
+
+def test_concurrent_readers_wait_for_flush_in_progress(make_db):
+    # пока один поток фиксирует отложенное, остальные читатели не должны видеть старый снимок
+    db = make_db(commit_delay=60)
+    db.register_user("anna", "pw")
+    db.login_user("anna", "pw")
+    _count(db)
+    errors = []
+    for n in range(1, 51):
+        db.add_history("expense", 1, "Еда", description="x" * 20000)
+        barrier = threading.Barrier(4)
+
+        def reader():
+            barrier.wait()
+            got = _count(db)
+            if got != n:
+                errors.append((n, got))
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+    assert errors == []
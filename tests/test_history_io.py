@@ -0,0 +1,69 @@
+# tests/test_history_io.py
+import io
+
+import pytest
+
+import history_io
+
+
+def test_export_import_maps_members_by_name(make_db):
+    src = make_db("src.db")
+    src.register_user("anna", "pw")
+    src.login_user("anna", "pw")
+    src.add_family_member("Мама", "Мама")
+    src.add_history("expense", 10, "Еда", "", "01.02.2024 10:00", src.get_member_id("Мама"))
+    src.add_history("expense", 20, "Еда", "", "02.02.2024 10:00", None)
+
+    dst = make_db("dst.db")
+    dst.register_user("boris", "pw")
+    dst.login_user("boris", "pw")
+    # у участников в другой базе другие id
+    dst.add_family_member("Сын", "Сын")
+    dst.add_family_member("Мама", "Мама")
+    assert dst.get_member_id("Мама") != src.get_member_id("Мама")
+
+    for export, load in ((history_io.export_csv, history_io.import_csv),
+                         (history_io.export_json, history_io.import_json)):
+        buf = io.StringIO()
+        assert export(src, buf) == 2
+        assert "member_id" not in buf.getvalue()
+        buf.seek(0)
+        assert load(dst, buf) == 2
+
+    rows = sorted((r[1], r[5]) for r in dst.get_history())
+    mama = dst.get_member_id("Мама")
+    assert rows == [(10.0, mama), (10.0, mama), (20.0, None), (20.0, None)]
+
+
+def test_import_unknown_member_is_rejected(user_db):
+    buf = io.StringIO("type,amount,category,description,date,member\nexpense,5,Еда,,,Дедушка\n")
+    with pytest.raises(ValueError):
+        history_io.import_csv(user_db, buf)
+    assert user_db.get_history() == []
+
+
+def test_import_ambiguous_member_name_is_rejected(make_db):
+    src = make_db("src.db")
+    src.register_user("anna", "pw")
+    src.login_user("anna", "pw")
+    for amount in (10, 20):
+        src.add_history("expense", amount, "Еда", "", "01.02.2024 10:00", src.add_family_member("Кот", "Питомец"))
+
+    dst = make_db("dst.db")
+    dst.register_user("anna", "pw")
+    dst.login_user("anna", "pw")
+    dst.add_family_member("Кот", "Питомец")
+    dst.add_family_member("Кот", "Питомец")
+    buf = io.StringIO()
+    history_io.export_csv(src, buf)
+    buf.seek(0)
+    with pytest.raises(ValueError, match="Кот"):
+        history_io.import_csv(dst, buf)
+    assert dst.get_history() == []
+
+
+def test_import_legacy_member_id_column(user_db):
+    mid = user_db.add_family_member("Папа", "Папа")
+    buf = io.StringIO(f"type,amount,category,description,date,member_id\nexpense,5,Еда,,,{mid}\n")
+    assert history_io.import_csv(user_db, buf) == 1
+    assert user_db.get_history()[0][5] == mid
@@ -0,0 +1,27 @@
+# tests/test_lazy_imports.py
+"""Тяжёлые зависимости не импортируются, пока не понадобятся (каждый модуль — в отдельном процессе)."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _imports_numpy(module):
+    code = f"import sys, {module}; print('numpy' in sys.modules)"
+    env = dict(os.environ, KIVY_NO_ARGS="1", KIVY_NO_CONSOLELOG="1")
+    env.pop("FU_ANALYTICS_ENGINE", None)
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return out.strip().splitlines()[-1] == "True"
+
+
+def test_cli_does_not_import_numpy():
+    assert not _imports_numpy("cli")
+
+
+def test_analytics_screen_does_not_import_numpy():
+    pytest.importorskip("kivy")
+    assert not _imports_numpy("analytics")
@@ -0,0 +1,22 @@
+# tests/test_line_widget.py
+"""LineWidget держит подготовленные точки только для текущей ширины (нужен Kivy; окно не создаётся)."""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+pytest.importorskip("kivy")
+
+from analytics import LineWidget  # noqa: E402
+
+
+def test_resize_keeps_one_series():
+    start = datetime(2024, 1, 1)
+    widget = LineWidget(size=(100, 100))
+    widget.set_points([(start + timedelta(days=i), float(i % 17)) for i in range(1000)])
+    for width in range(100, 401, 6):
+        widget.size = (width, 100)
+    assert list(widget._series) == [400]
+    assert len(widget._line.points) <= 2 * 2 * 400
@@ -0,0 +1,72 @@
+# tests/test_memory_db.py
+"""Database(":memory:"): одна база на все потоки объекта, но своя у каждого объекта."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def mem_db():
+    db = Database(":memory:", slow_ms=None)
+    db.register_user("anna", "pw")
+    db.login_user("anna", "pw")
+    yield db
+    db.close()
+
+
+def test_other_threads_see_schema_and_data(mem_db):
+    mem_db.add_history("expense", 5, "Еда")
+    # как фоновый поток AsyncDatabase
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        assert len(pool.submit(mem_db.get_history).result()) == 1
+        assert pool.submit(mem_db.get_category_totals, "expense").result() == [("Еда", 5.0)]
+
+
+def test_objects_do_not_share_data(mem_db):
+    other = Database(":memory:", slow_ms=None)
+    try:
+        mem_db.add_history("expense", 5, "Еда")
+        assert other._execute("SELECT COUNT(*) FROM history").fetchone()[0] == 0
+    finally:
+        other.close()
+
+
+@pytest.mark.parametrize("commit_delay", [None, 0.001])
+def test_concurrent_writer_and_readers(commit_delay):
+    db = Database(":memory:", commit_delay=commit_delay, slow_ms=None)
+    db.register_user("anna", "pw")
+    db.login_user("anna", "pw")
+    errors = []
+
+    def writer():
+        try:
+            for _ in range(200):
+                db.add_history("expense", 1, "Еда", date="01.03.2024 10:00")
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            last = 0
+            for _ in range(200):
+                with db.read_snapshot():
+                    n = len(db.get_history())
+                    db.get_daily_totals("expense")
+                assert n >= last
+                last = n
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+    try:
+        assert errors == []
+        assert db.get_category_totals("expense") == [("Еда", 200.0)]
+    finally:
+        db.close()
@@ -0,0 +1,108 @@
+# tests/test_server.py
+"""ApiServer на свободном порту: запросы через loadtest.Client."""
+import asyncio
+
+import pytest
+
+from loadtest import Client
+from server import MAX_BODY, ApiServer
+
+
+def _serve(db, scenario, **kwargs):
+    async def run():
+        server = ApiServer(db, port=0, **kwargs)
+        await server.start()
+        try:
+            return await scenario(server.port)
+        finally:
+            await server.close()
+
+    return asyncio.run(run())
+
+
+async def _login(port, username="anna"):
+    client = Client("127.0.0.1", port)
+    await client.request("POST", "/register", {"username": username, "password": "pw"})
+    status, payload = await client.request("POST", "/login", {"username": username, "password": "pw"})
+    assert status == 200
+    client.token = payload["token"]
+    return client
+
+
+@pytest.mark.parametrize("commit_delay", [None, 0.05, 60])
+def test_read_after_write(make_db, commit_delay):
+    db = make_db(commit_delay=commit_delay)
+
+    async def scenario(port):
+        writer = await _login(port)
+        readers = [await _login(port) for _ in range(3)]
+        for n in range(1, 21):
+            assert (await writer.request("POST", "/history", {"type": "income", "amount": 10}))[0] == 201
+            # чтения идут параллельно и попадают в разные потоки пула
+            pages = await asyncio.gather(writer.request("GET", "/history?limit=100"),
+                                         *(r.request("GET", "/balance") for r in readers))
+            assert len(pages[0][1]["items"]) == n
+            assert all(payload["balance"] == 10 * n for _, payload in pages[1:])
+        for client in [writer] + readers:
+            await client.close()
+
+    _serve(db, scenario, workers=4)
+
+
+async def _raw(port, content_length):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        # тело не отправляется: ответ должен прийти до попытки его прочитать
+        writer.write(f"POST /register HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        head = (await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)).decode("latin-1")
+        return int(head.split(" ")[1]), "Connection: close" in head
+    finally:
+        writer.close()
+
+
+@pytest.mark.parametrize("content_length, status", [
+    ("abc", 400), ("-5", 400), ("1.5", 400), ("+3", 400), ("\u00b2", 400), (str(MAX_BODY + 1), 413),
+])
+def test_invalid_content_length(make_db, content_length, status):
+    db = make_db()
+    assert _serve(db, lambda port: _raw(port, content_length)) == (status, True)
+
+
+@pytest.mark.parametrize("body", [
+    {"type": "expense", "amount": 1e309},
+    {"type": "expense", "amount": float("nan")},
+    {"type": "expense", "amount": 10 ** 400},
+    {"type": "expense", "amount": 10, "member": ["x"]},
+    {"type": "expense", "amount": 10, "member": 5},
+    {"type": "expense", "amount": 10, "date": "garbage"},
+])
+def test_add_history_rejects_invalid_fields(make_db, body):
+    db = make_db()
+
+    async def scenario(port):
+        client = await _login(port)
+        status, _ = await client.request("POST", "/history", body)
+        _, page = await client.request("GET", "/history")
+        _, balance = await client.request("GET", "/balance")
+        await client.close()
+        return status, page["items"], balance["balance"]
+
+    assert _serve(db, scenario) == (400, [], 0.0)
+
+
+@pytest.mark.parametrize("limit, status, count", [("0", 400, 0), ("-1", 400, 0), ("3", 200, 3), ("100000", 200, 5)])
+def test_history_limit(make_db, monkeypatch, limit, status, count):
+    import server
+    monkeypatch.setattr(server, "PAGE_LIMIT", 5)
+    db = make_db()
+
+    async def scenario(port):
+        client = await _login(port)
+        for _ in range(8):
+            await client.request("POST", "/history", {"type": "expense", "amount": 1, "date": "01.03.2024"})
+        status, payload = await client.request("GET", f"/history?limit={limit}")
+        await client.close()
+        return status, len(payload.get("items", []))
+
+    assert _serve(db, scenario) == (status, count)
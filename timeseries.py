@@ -0,0 +1,130 @@
+# timeseries.py
+"""
+Подготовка временных рядов для графика тренда (LineWidget), без зависимости от Kivy.
+
+  bucket_points(points, "day" | "week" | "month") — суммы по дням, неделям (с понедельника) или месяцам;
+  choose_bucket(points, columns)                  — самый мелкий интервал, при котором точек не больше, чем колонок;
+  normalize(points)                               — координаты в [0, 1] x [0, 1];
+  minmax_downsample(xs, ys, columns)              — не больше двух точек (min и max) на колонку пикселей;
+  period_bounds(preset) / day_bounds(first, last) — границы периода в метках ts (см. database.date_to_ts).
+"""
+import calendar
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+BUCKETS = ("day", "week", "month")
+PERIODS = ("all", "month", "quarter", "year")
+Point = Tuple[datetime, float]
+
+
+def _bucket_start(dt: datetime, bucket: str) -> datetime:
+    day = datetime(dt.year, dt.month, dt.day)
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Неизвестный интервал: {bucket!r}")
+
+
+def bucket_points(points: Sequence[Point], bucket: str) -> List[Point]:
+    """Суммирует точки (отсортированные по дате) по началу интервала."""
+    sums: "OrderedDict[datetime, float]" = OrderedDict()
+    for dt, v in points:
+        key = _bucket_start(dt, bucket)
+        sums[key] = sums.get(key, 0.0) + v
+    return list(sums.items())
+
+
+def choose_bucket(points: Sequence[Point], columns: int) -> str:
+    """Интервал для ряда по дням: день, пока дней не больше колонок, затем неделя, затем месяц."""
+    if not points:
+        return "day"
+    span = (points[-1][0] - points[0][0]).days + 1
+    if span <= columns:
+        return "day"
+    if span / 7 <= columns:
+        return "week"
+    return "month"
+
+
+def normalize(points: Sequence[Point]) -> Tuple[List[float], List[float]]:
+    """x и y в долях от ширины и высоты графика (нижняя граница y — 0, если все значения равны)."""
+    if not points:
+        return [], []
+    xs = [(dt - points[0][0]).total_seconds() for dt, _ in points]
+    ys = [float(v) for _, v in points]
+    minx, maxx = xs[0], xs[-1]
+    miny, maxy = min(ys), max(ys)
+    if miny == maxy:
+        miny = 0
+    dx = maxx - minx if maxx != minx else 1
+    dy = maxy - miny if maxy != miny else 1
+    return [(x - minx) / dx for x in xs], [(y - miny) / dy for y in ys]
+
+
+def minmax_downsample(xs: Sequence[float], ys: Sequence[float], columns: int) -> Tuple[List[float], List[float]]:
+    """
+    Оставляет в каждой колонке пикселей минимум и максимум (в исходном порядке),
+    так что пики не теряются, а точек не больше 2 * columns. xs — по возрастанию, в [0, 1].
+    """
+    if len(xs) <= 2 * columns:
+        return list(xs), list(ys)
+    out_x: List[float] = []
+    out_y: List[float] = []
+    col = None
+    lo = hi = 0
+
+    def emit():
+        for i in sorted({lo, hi}):
+            out_x.append(xs[i])
+            out_y.append(ys[i])
+
+    for i, x in enumerate(xs):
+        c = min(int(x * columns), columns - 1)
+        if c != col:
+            if col is not None:
+                emit()
+            col, lo, hi = c, i, i
+        elif ys[i] < ys[lo]:
+            lo = i
+        elif ys[i] > ys[hi]:
+            hi = i
+    emit()
+    return out_x, out_y
+
+
+def _day_ts(d: date) -> int:
+    # как date_to_ts: локальная полночь, записанная "как UTC"
+    return calendar.timegm(d.timetuple())
+
+
+def day_bounds(first: date, last: date) -> Tuple[int, int]:
+    """Диапазон [first, last] включительно как [date_from, date_to) в метках ts."""
+    return _day_ts(first), _day_ts(last + timedelta(days=1))
+
+
+def period_bounds(preset: str, today: Optional[date] = None) -> Tuple[Optional[int], Optional[int]]:
+    """
+    (date_from, date_to) для текущего месяца, квартала или года; (None, None) для "all".
+    Границы — начала суток, поэтому запросы обслуживаются из daily_rollup.
+    """
+    if preset not in PERIODS:
+        raise ValueError(f"Неизвестный период: {preset!r}")
+    if preset == "all":
+        return None, None
+    today = today or date.today()
+    if preset == "month":
+        first = today.replace(day=1)
+        months = 1
+    elif preset == "quarter":
+        first = date(today.year, (today.month - 1) // 3 * 3 + 1, 1)
+        months = 3
+    else:
+        first = date(today.year, 1, 1)
+        months = 12
+    m = first.month - 1 + months
+    end = date(first.year + m // 12, m % 12 + 1, 1)
+    return _day_ts(first), _day_ts(end)
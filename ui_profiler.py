@@ -0,0 +1,161 @@
+# ui_profiler.py
+"""
+Профилировщик интерфейса (включается переменной окружения FU_PROFILE=1).
+
+  - время кадров через Clock: среднее, p95, максимум и число «рывков» (> JANK_MS) за последние FRAME_WINDOW кадров;
+  - раз в SAMPLE_INTERVAL секунд: число виджетов и инструкций canvas на каждом построенном экране и RSS процесса;
+  - раз в GC_INTERVAL секунд: число живых объектов Widget (gc) — если оно растёт быстрее,
+    чем виджеты в дереве экранов, старые виджеты где-то удерживаются;
+  - переходы между экранами: после каждого снимается отдельная точка.
+
+Сводка выводится поверх окна; с FU_PROFILE_OUT=путь.json все точки сохраняются при выходе.
+"""
+import gc
+import json
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.logger import Logger
+from kivy.uix.label import Label
+from kivy.uix.widget import Widget
+
+FRAME_WINDOW = 300
+JANK_MS = 33.0
+SAMPLE_INTERVAL = 1.0
+GC_INTERVAL = 10.0
+MAX_SAMPLES = 3600
+
+
+def rss_bytes() -> Optional[int]:
+    """Текущий RSS процесса (Linux — /proc), иначе пиковый из getrusage; None, если узнать нельзя."""
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _instructions(group) -> int:
+    n = 0
+    for child in getattr(group, "children", None) or []:
+        n += 1 + _instructions(child)
+    return n
+
+
+def count_tree(root: Widget) -> Dict[str, int]:
+    """
+    Число виджетов в поддереве и инструкций в canvas.
+    Canvas дочерних виджетов (и canvas.before/after) вложены в canvas родителя,
+    поэтому инструкции считаются один раз — от корня.
+    """
+    widgets = sum(1 for _ in root.walk(restrict=True))
+    return {"widgets": widgets, "instructions": _instructions(root.canvas)}
+
+
+class UIProfiler:
+    def __init__(self, manager, out_path: Optional[str] = None):
+        self.manager = manager
+        self.out_path = out_path
+        self.frames: deque = deque(maxlen=FRAME_WINDOW)
+        self.samples: List[Dict[str, Any]] = []
+        self.transitions = 0
+        self.live_widgets: Optional[int] = None
+        self._started = time.perf_counter()
+        self._last_gc = 0.0
+        self._events = []
+        self.overlay = Label(size_hint=(None, None), font_size=11, halign="left", valign="top",
+                             color=(1, 1, 0.4, 1))
+
+    # ---------- запуск ----------
+    def start(self):
+        self._events = [Clock.schedule_interval(self._on_frame, 0),
+                        Clock.schedule_interval(lambda dt: self.sample(), SAMPLE_INTERVAL)]
+        self.manager.bind(current=self._on_transition)
+        Window.add_widget(self.overlay)
+        Window.bind(size=self._place_overlay)
+        self._place_overlay()
+        Logger.info("UIProfiler: включён")
+
+    def stop(self):
+        for ev in self._events:
+            ev.cancel()
+        self._events = []
+        self.manager.unbind(current=self._on_transition)
+        if self.out_path:
+            try:
+                self.dump(self.out_path)
+            except OSError as e:
+                Logger.warning(f"UIProfiler: не удалось сохранить {self.out_path}: {e}")
+
+    def _place_overlay(self, *args):
+        self.overlay.size = (Window.width * 0.45, Window.height * 0.3)
+        self.overlay.text_size = self.overlay.size
+        self.overlay.pos = (Window.width - self.overlay.width - 8, Window.height - self.overlay.height - 8)
+
+    # ---------- измерения ----------
+    def _on_frame(self, dt):
+        self.frames.append(dt * 1000)
+
+    def _on_transition(self, manager, name):
+        self.transitions += 1
+        # точка после построения и отрисовки нового экрана
+        Clock.schedule_once(lambda dt: self.sample(event=f"-> {name}"), 0)
+
+    def frame_stats(self) -> Dict[str, float]:
+        frames = sorted(self.frames)
+        if not frames:
+            return {"frames": 0, "avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0, "janky": 0}
+        return {"frames": len(frames), "avg_ms": round(sum(frames) / len(frames), 2),
+                "p95_ms": round(frames[min(len(frames) - 1, int(len(frames) * 0.95))], 2),
+                "max_ms": round(frames[-1], 2), "janky": sum(1 for f in frames if f > JANK_MS)}
+
+    def sample(self, event: Optional[str] = None) -> Dict[str, Any]:
+        now = time.perf_counter() - self._started
+        if now - self._last_gc >= GC_INTERVAL or self.live_widgets is None:
+            self._last_gc = now
+            self.live_widgets = sum(1 for o in gc.get_objects() if isinstance(o, Widget))
+        screens = {s.name: count_tree(s) for s in self.manager.screens}
+        point = {
+            "t": round(now, 2),
+            "event": event,
+            "screen": self.manager.current,
+            "transitions": self.transitions,
+            "rss": rss_bytes(),
+            "live_widgets": self.live_widgets,
+            "tree_widgets": sum(c["widgets"] for c in screens.values()),
+            "screens": screens,
+            "frames": self.frame_stats(),
+        }
+        self.samples.append(point)
+        if len(self.samples) > MAX_SAMPLES:
+            del self.samples[0]
+        self._render(point)
+        return point
+
+    def _render(self, p):
+        f = p["frames"]
+        rss = f"{p['rss'] / 1048576:.1f} MB" if p["rss"] else "?"
+        lines = [
+            f"кадры: avg {f['avg_ms']} ms, p95 {f['p95_ms']} ms, max {f['max_ms']} ms, рывков {f['janky']}/{f['frames']}",
+            f"RSS {rss}, переходов {p['transitions']}",
+            f"виджеты: в дереве {p['tree_widgets']}, живых {p['live_widgets']}",
+        ]
+        for name, c in p["screens"].items():
+            mark = "*" if name == p["screen"] else " "
+            lines.append(f"{mark}{name}: {c['widgets']} видж., {c['instructions']} инстр.")
+        self.overlay.text = "\n".join(lines)
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump({"samples": self.samples}, fp, ensure_ascii=False, indent=1)